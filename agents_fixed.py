@@ -5,16 +5,23 @@ load_dotenv()
 
 from crewai import Agent
 from langchain_openai import ChatOpenAI
-from tools import search_tool, FinancialDocumentTool
+from tools import search_tool, read_pages_tool, retrieve_context_tool
+from rate_limiter import get_rate_limit_handler, rate_limited_llm
 
 ### Loading LLM
-llm = ChatOpenAI(model="gpt-4", temperature=0.7)
+# Every LLM call waits for the cluster-wide request/token budget shared through Redis
+llm = ChatOpenAI(model="gpt-4", temperature=0.7, callbacks=[get_rate_limit_handler()])
+# Agents call litellm through crewai's LLM, so they get the limit from a wrapper around its calls
+crew_llm = rate_limited_llm(model="gpt-4", temperature=0.7)
+
+# Verbose agent logging is for development; it costs log I/O on every step in production
+VERBOSE = os.getenv('APP_ENV', 'development') != 'production'
 
 # Creating an Experienced Financial Analyst agent
 financial_analyst = Agent(
     role="Senior Financial Analyst",
     goal="Provide comprehensive and accurate financial analysis based on the query: {query}",
-    verbose=True,
+    verbose=VERBOSE,
     memory=True,
     backstory=(
         "You are an experienced financial analyst with 15+ years in investment banking and equity research. "
@@ -23,8 +30,8 @@ financial_analyst = Agent(
         "You always consider risk factors and regulatory compliance in your recommendations. "
         "You base your analysis on factual data from financial documents and market research."
     ),
-    tools=[FinancialDocumentTool().read_data_tool, search_tool],
-    llm=llm,
+    tools=[retrieve_context_tool, read_pages_tool, search_tool],
+    llm=crew_llm,
     max_iter=3,
     max_rpm=10,
     allow_delegation=False
@@ -34,14 +41,14 @@ financial_analyst = Agent(
 verifier = Agent(
     role="Financial Document Verifier",
     goal="Verify and validate the authenticity and accuracy of financial documents",
-    verbose=True,
+    verbose=VERBOSE,
     memory=True,
     backstory=(
         "You are a meticulous document verification specialist with expertise in financial compliance. "
         "You ensure all financial documents meet regulatory standards and contain accurate information. "
         "You have experience with SEC filings, annual reports, and various financial statement formats."
     ),
-    llm=llm,
+    llm=crew_llm,
     max_iter=2,
     max_rpm=10,
     allow_delegation=False
@@ -50,13 +57,13 @@ verifier = Agent(
 investment_advisor = Agent(
     role="Investment Research Advisor",
     goal="Provide balanced investment recommendations based on comprehensive financial analysis",
-    verbose=True,
+    verbose=VERBOSE,
     backstory=(
         "You are a certified investment advisor with expertise in portfolio management and risk assessment. "
         "You provide evidence-based investment recommendations considering client risk tolerance and market conditions. "
         "You always disclose potential risks and ensure recommendations comply with financial regulations."
     ),
-    llm=llm,
+    llm=crew_llm,
     max_iter=2,
     max_rpm=10,
     allow_delegation=False
@@ -65,13 +72,13 @@ investment_advisor = Agent(
 risk_assessor = Agent(
     role="Risk Assessment Specialist", 
     goal="Conduct thorough risk analysis of investment opportunities and financial positions",
-    verbose=True,
+    verbose=VERBOSE,
     backstory=(
         "You are a risk management expert with deep experience in quantitative risk modeling. "
         "You identify, analyze, and quantify various types of financial risks including market, credit, and operational risks. "
         "You provide realistic risk assessments with appropriate mitigation strategies."
     ),
-    llm=llm,
+    llm=crew_llm,
     max_iter=2,
     max_rpm=10,
     allow_delegation=False
@@ -0,0 +1,229 @@
+"""Benchmark: offline end-to-end throughput of /analyze with a stub LLM and search tool
+
+Run with ``python benchmarks/bench_e2e.py [--pages 1,10,100,500] [--requests N] [--concurrency N]``.
+No network or API keys are needed: ChatOpenAI, crewai.LLM and
+SerperDevTool are replaced by the deterministic stand-ins in
+offline_stubs.py, which sleep for ``--llm-latency`` / ``--search-latency``
+seconds per call. The harness
+
+* generates synthetic financial filings of each requested page count,
+* times cold text extraction of each one,
+* drives POST /analyze in-process through httpx's ASGI transport with
+  ``--concurrency`` clients, each request asking a distinct question so
+  the result cache never answers it, and
+* prints p50/p95/p99 latency, requests/sec and peak RSS.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import importlib
+import resource
+import tempfile
+import textwrap
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_tmp_dir = tempfile.mkdtemp(prefix='bench_e2e_')
+os.environ.update({
+    'OPENAI_API_KEY': 'offline-benchmark',
+    'SERPER_API_KEY': 'offline-benchmark',
+    'APP_ENV': 'production',
+    'CELERY_BROKER_URL': 'memory://',
+    'CELERY_RESULT_BACKEND': 'cache+memory://',
+    'CELERY_TASK_ALWAYS_EAGER': 'true',
+    'REDIS_URL': 'memory://',
+    'DATABASE_URL': f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}",
+    'DOCUMENT_CACHE_DIR': os.path.join(_tmp_dir, 'cache'),
+    'CREWAI_DISABLE_TELEMETRY': 'true',
+    'OTEL_SDK_DISABLED': 'true',
+    # Agent calls still pass through the rate limiter, but with room to spare so it never throttles the run
+    'LLM_REQUESTS_PER_MINUTE': '1000000',
+    'LLM_TOKENS_PER_MINUTE': '1000000000',
+})
+
+# Periods and line items for the synthetic statement tables
+PERIODS = ['Q1-2024', 'Q2-2024', 'Q3-2024', 'Q4-2024']
+STATEMENT_LINES = [
+    ('Total revenues', 25500), ('Total cost of revenues', 21100), ('Gross profit', 4400),
+    ('Total operating expenses', 2900), ('Income from operations', 1500), ('Interest expense', 90),
+    ('Net income', 1200), ('Net cash provided by operating activities', 2600),
+    ('Capital expenditures', 2300), ('Total current assets', 52000), ('Inventory', 14000),
+    ('Total assets', 122000), ('Total current liabilities', 29000), ('Total liabilities', 48000),
+    ("Total stockholders' equity", 72000),
+]
+PROSE = (
+    "Management believes demand trends remain healthy across regions while pricing actions weigh on margins. "
+    "Operating expenses reflect continued investment in research, manufacturing capacity and software. "
+    "Risk factors include supply chain disruption, interest rate changes, regulatory review and competition."
+)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def page_lines(number: int) -> list:
+    """Text of one synthetic page: a statement table every fifth page, MD&A prose otherwise"""
+    if number % 5 == 1:
+        lines = [f"Consolidated Statements of Operations (page {number})", "In millions " + " ".join(PERIODS)]
+        for label, base in STATEMENT_LINES:
+            values = [f"{base * (1 + 0.03 * i + 0.001 * number):,.0f}" for i in range(len(PERIODS))]
+            lines.append(f"{label} {' '.join(values)}")
+        return lines
+    return [f"Management's Discussion and Analysis (page {number})"] + textwrap.wrap(PROSE, 90) * 4
+
+
+def write_pdf(path: str, pages: int):
+    """Write a minimal valid PDF with extractable text on every page (no PDF library needed)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, pages + 1):
+        body = "BT /F1 10 Tf 50 760 Td 13 TL " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in page_lines(number)
+        ) + " ET"
+        stream = body.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for index, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (index, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def import_app():
+    """Import the API with the stubs in place (agents/tools/task/main resolve to their *_fixed files)"""
+    import app_modules
+    app_modules.install()
+    return importlib.import_module('main')
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its reaped children, in MB (Linux reports KB)"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def bench_extraction(page_counts: list) -> dict:
+    from extraction import read_document_text
+
+    paths = {}
+    print(f"{'pages':>6} {'pdf MB':>8} {'extract s':>10} {'cached s':>9}")
+    for pages in page_counts:
+        path = os.path.join(_tmp_dir, f'filing_{pages}.pdf')
+        write_pdf(path, pages)
+        started = time.perf_counter()
+        read_document_text(path)
+        cold = time.perf_counter() - started
+        started = time.perf_counter()
+        read_document_text(path)
+        warm = time.perf_counter() - started
+        paths[pages] = path
+        print(f"{pages:>6} {os.path.getsize(path) / 1e6:>8.2f} {cold:>10.3f} {warm:>9.3f}")
+    return paths
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def bench_analyze(app, pdf_path: str, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    with open(pdf_path, 'rb') as f:
+        pdf = f.read()
+    latencies = []
+    failures = {}
+    next_request = iter(range(requests))
+
+    async def client_loop(client):
+        for i in next_request:
+            started = time.perf_counter()
+            response = await client.post(
+                '/analyze',
+                files={'file': ('filing.pdf', pdf, 'application/pdf')},
+                data={'query': f'Assess profitability and liquidity trends, question {i}'},
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures[response.status_code] = failures.get(response.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'ok': len(latencies),
+        'failures': failures,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50) if latencies else float('nan'),
+        'p95': percentile(latencies, 95) if latencies else float('nan'),
+        'p99': percentile(latencies, 99) if latencies else float('nan'),
+        'mean': statistics.mean(latencies) if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', default='1,10,100,500', help='Comma-separated page counts (1-500)')
+    parser.add_argument('--analyze-pages', type=int, default=None,
+                        help='Page count of the filing sent to /analyze (default: largest of --pages)')
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--search-latency', type=float, default=0.2)
+    parser.add_argument('--answer-words', type=int, default=300)
+    args = parser.parse_args()
+
+    page_counts = sorted({max(1, min(500, int(value))) for value in args.pages.split(',') if value.strip()})
+
+    import offline_stubs
+    offline_stubs.install(args.llm_latency, args.search_latency, args.answer_words)
+    main_module = import_app()
+
+    main_module.warmup()
+    print(f"workdir: {_tmp_dir}")
+    print(f"crew mode: {main_module.CREW_MODE}, llm latency {args.llm_latency}s, search latency {args.search_latency}s")
+    paths = bench_extraction(page_counts)
+
+    analyze_pages = args.analyze_pages or page_counts[-1]
+    if analyze_pages not in paths:
+        paths[analyze_pages] = os.path.join(_tmp_dir, f'filing_{analyze_pages}.pdf')
+        write_pdf(paths[analyze_pages], analyze_pages)
+    result = asyncio.run(bench_analyze(main_module.app, paths[analyze_pages], args.requests, args.concurrency))
+
+    print(f"\n/analyze: {analyze_pages}-page filing, {args.requests} requests, {args.concurrency} clients")
+    print(f"{'ok':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'peak RSS MB':>12}")
+    print(f"{result['ok']:>5} {result['rps']:>8.2f} {result['p50']:>8.3f} {result['p95']:>8.3f} "
+          f"{result['p99']:>8.3f} {peak_rss_mb():>12.1f}")
+    if result['failures']:
+        print(f"non-200 responses: {result['failures']}")
+
+
+if __name__ == "__main__":
+    main()
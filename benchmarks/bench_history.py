@@ -0,0 +1,104 @@
+"""Benchmark: get_user_analysis_history with sync vs. async database sessions
+
+Run with ``python benchmarks/bench_history.py [--rows N] [--requests N] [--concurrency N]``.
+Seeds a throwaway SQLite database (or the one in BENCH_DATABASE_URL), then
+issues the same number of history lookups through
+
+* the sync helpers from database.py, each offloaded to a thread the way a
+  FastAPI endpoint would have to call them, and
+* the async helpers from database_async.py, awaited directly,
+
+and prints requests/sec for both.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp_dir = tempfile.mkdtemp(prefix='bench_history_')
+BENCH_DATABASE_URL = os.getenv('BENCH_DATABASE_URL', f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}")
+os.environ['DATABASE_URL'] = BENCH_DATABASE_URL
+os.environ.setdefault('DB_ECHO', 'false')
+
+import database
+import database_async
+
+
+def seed(rows: int, users: int):
+    database.create_tables()
+    db = database.SessionLocal()
+    try:
+        db.bulk_insert_mappings(database.AnalysisResult, [
+            {
+                'task_id': f'task-{i}',
+                'user_id': i % users,
+                'file_name': f'report-{i}.pdf',
+                'original_query': 'Summarize revenue trends',
+                'analysis_text': 'x' * 2000,
+                'processing_time': 1.0,
+                'status': 'completed',
+            }
+            for i in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def sync_lookup(user_id: int):
+    db = database.SessionLocal()
+    try:
+        return database.get_user_analysis_history(db, user_id)
+    finally:
+        db.close()
+
+
+async def run_sync_mode(requests: int, concurrency: int, users: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await asyncio.to_thread(sync_lookup, i % users)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def run_async_mode(requests: int, concurrency: int, users: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            async with database_async.AsyncSessionLocal() as db:
+                await database_async.get_user_analysis_history(db, i % users)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"database: {BENCH_DATABASE_URL}")
+    seed(args.rows, args.users)
+
+    sync_rps = asyncio.run(run_sync_mode(args.requests, args.concurrency, args.users))
+    async_rps = asyncio.run(run_async_mode(args.requests, args.concurrency, args.users))
+    print(f"{'mode':<8} {'requests/sec':>14}")
+    print(f"{'sync':<8} {sync_rps:>14.1f}")
+    print(f"{'async':<8} {async_rps:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
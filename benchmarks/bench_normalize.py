@@ -0,0 +1,76 @@
+"""Micro-benchmark: single-pass whitespace normalization vs. the old replace loops
+
+Run with ``python benchmarks/bench_normalize.py``. For each input size the
+script times the old ``while ... in text: text = text.replace(...)`` loops and
+``normalization.normalize_whitespace`` on pathological inputs, and checks
+that the new version's time per MB stays flat as the input grows.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalization import normalize_whitespace
+
+SIZES_MB = [0.25, 0.5, 1, 2, 4]
+# Allowed growth of time-per-MB between the smallest and largest input
+LINEARITY_TOLERANCE = 2.5
+
+
+def legacy_normalize(text):
+    """The replace loops previously used by read_data_tool and analyze_investment_tool"""
+    while "\n\n" in text:
+        text = text.replace("\n\n", "\n")
+    while "  " in text:
+        text = text.replace("  ", " ")
+    return text.strip()
+
+
+def padded_columns(size_bytes):
+    """Table rows whose columns are padded with thousands of spaces"""
+    row = "Total revenues" + " " * 4000 + "25,500" + " " * 4000 + "21,301\n" + "\n" * 200
+    return (row * (size_bytes // len(row) + 1))[:size_bytes]
+
+
+def blank_line_storm(size_bytes):
+    """Short lines separated by long runs of blank lines"""
+    row = "Net income 1,172" + "\n" * 5000
+    return (row * (size_bytes // len(row) + 1))[:size_bytes]
+
+
+def best_of(fn, text, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    failed = False
+    for name, generate in [("padded_columns", padded_columns), ("blank_line_storm", blank_line_storm)]:
+        print(f"\n{name}")
+        print(f"{'size MB':>8} {'legacy s':>10} {'single-pass s':>14} {'s/MB':>8}")
+        per_mb = []
+        for size_mb in SIZES_MB:
+            text = generate(int(size_mb * 1024 * 1024))
+            normalized = normalize_whitespace(text)
+            assert "  " not in normalized and "\n\n" not in normalized
+            assert normalized.split() == legacy_normalize(text).split()
+            legacy = best_of(legacy_normalize, text)
+            single = best_of(normalize_whitespace, text)
+            per_mb.append(single / size_mb)
+            print(f"{size_mb:>8} {legacy:>10.4f} {single:>14.4f} {per_mb[-1]:>8.4f}")
+        growth = per_mb[-1] / per_mb[0]
+        print(f"time per MB grew {growth:.2f}x from {SIZES_MB[0]} MB to {SIZES_MB[-1]} MB")
+        failed |= growth > LINEARITY_TOLERANCE
+    if failed:
+        print("\nFAIL: normalize_whitespace does not scale linearly")
+        sys.exit(1)
+    print("\nOK: normalize_whitespace scales linearly")
+
+
+if __name__ == "__main__":
+    main()
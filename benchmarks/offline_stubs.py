@@ -0,0 +1,92 @@
+"""Deterministic local stand-ins for the OpenAI LLM and the Serper search tool
+
+``install()`` must run before agents/tools are imported: it replaces
+``langchain_openai.ChatOpenAI``, ``crewai.LLM`` and
+``crewai_tools.SerperDevTool`` so the modules under test build their
+comparison LLM, their agents' rate-limited LLM and their search tool from
+these classes and never open a network connection.
+"""
+import time
+import hashlib
+from typing import ClassVar
+
+from crewai.llms.base_llm import BaseLLM
+from crewai.tools import BaseTool
+
+
+class StubLLM(BaseLLM):
+    """crewai-compatible LLM that sleeps for a fixed latency and answers at once
+
+    Accepts ChatOpenAI's and crewai.LLM's constructor arguments so it can
+    stand in for either unchanged. The answer is derived from a hash of the prompt, so the
+    same prompt always gets the same reply.
+    """
+
+    latency = 0.5
+    answer_words = 300
+
+    def __init__(self, model: str = "stub-gpt-4", temperature: float = None, callbacks=None, **kwargs):
+        super().__init__(model=model, temperature=temperature)
+        self.calls = 0
+
+    @staticmethod
+    def _prompt_text(messages) -> str:
+        if isinstance(messages, str):
+            return messages
+        return "\n".join(str(message.get("content", "")) for message in messages)
+
+    def _answer(self, prompt: str) -> str:
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        words = [f"insight-{seed[i % 64]}{i}" for i in range(self.answer_words)]
+        return " ".join(words)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs) -> str:
+        self.calls += 1
+        time.sleep(self.latency)
+        return f"Thought: I now know the final answer\nFinal Answer: {self._answer(self._prompt_text(messages))}"
+
+    def invoke(self, prompt, **kwargs):
+        """LangChain-style entry point used by the comparison summary"""
+        self.calls += 1
+        time.sleep(self.latency)
+        return type("StubMessage", (), {"content": self._answer(str(prompt))})()
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 8192
+
+
+class StubSerperDevTool(BaseTool):
+    """Offline replacement for SerperDevTool returning canned organic results"""
+
+    name: str = "Search the internet"
+    description: str = "Search the internet for market news and analyst commentary about a company."
+    latency: ClassVar[float] = 0.2
+
+    def _run(self, search_query: str = "", **kwargs) -> str:
+        time.sleep(self.latency)
+        return "\n".join(
+            f"Title: Result {i} for {search_query}\nLink: https://example.invalid/{i}\n"
+            f"Snippet: Offline benchmark result {i}."
+            for i in range(1, 6)
+        )
+
+
+def install(llm_latency: float = 0.5, search_latency: float = 0.2, answer_words: int = 300):
+    """Swap the real LLMs and search tool for the stubs (call before importing agents/tools)"""
+    import langchain_openai
+    import crewai
+    import crewai_tools
+
+    StubLLM.latency = llm_latency
+    StubLLM.answer_words = answer_words
+    StubSerperDevTool.latency = search_latency
+    langchain_openai.ChatOpenAI = StubLLM
+    # rate_limiter subclasses crewai.LLM when the agents are built, so they keep going through the limiter
+    crewai.LLM = StubLLM
+    crewai_tools.SerperDevTool = StubSerperDevTool
@@ -0,0 +1,78 @@
+"""Profile: how long importing the API takes, and which modules it pulls in
+
+Run with ``python benchmarks/profile_imports.py [--module main] [--top N] [--warmup]``.
+Imports the module in a fresh interpreter under ``python -X importtime``
+and prints the wall time, whether the heavy crew stack (crewai,
+crewai_tools, langchain_openai, litellm) was loaded, and the slowest
+imports by cumulative time. With ``--warmup`` it also times ``warmup()``,
+the work a pre-forking server or Celery worker does once in the parent.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('crewai', 'crewai_tools', 'langchain_openai', 'litellm', 'chromadb')
+
+CHILD = """
+import sys, time, json
+sys.path.insert(0, {bench_dir!r})
+import app_modules
+app_modules.install()
+started = time.perf_counter()
+module = __import__({module!r})
+import_seconds = time.perf_counter() - started
+warmup_seconds = None
+if {warmup!r}:
+    started = time.perf_counter()
+    module.warmup()
+    warmup_seconds = time.perf_counter() - started
+print(json.dumps({{
+    'import_seconds': import_seconds,
+    'warmup_seconds': warmup_seconds,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """(cumulative microseconds, self microseconds, module) for each -X importtime line"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--warmup', action='store_true')
+    args = parser.parse_args()
+
+    code = CHILD.format(bench_dir=BENCH_DIR, module=args.module, warmup=args.warmup, heavy=HEAVY_MODULES)
+    env = dict(os.environ, CELERY_BROKER_URL=os.getenv('CELERY_BROKER_URL', 'memory://'),
+               REDIS_URL=os.getenv('REDIS_URL', 'memory://'))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        print(proc.stderr[-4000:], file=sys.stderr)
+        sys.exit(proc.returncode)
+
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    print(f"import {args.module}: {report['import_seconds']:.2f}s")
+    if report['warmup_seconds'] is not None:
+        print(f"warmup(): {report['warmup_seconds']:.2f}s")
+    print(f"heavy modules loaded: {', '.join(report['loaded']) or 'none'}")
+
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(parse_importtime(proc.stderr), reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
 # Bonus Feature 1: Queue Worker Model with Celery and Redis
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 import os
+import time
 from dotenv import load_dotenv
-import redis
+
+from redis_backend import create_redis_client
+from result_store import ResultStore, JobCheckpoints
+from retry_policy import ANALYSIS_MAX_RETRIES, is_permanent, backoff_delay
+import metrics
 
 load_dotenv()
 
@@ -25,48 +31,74 @@ celery_app.conf.update(
     task_annotations={'*': {'rate_limit': '10/s'}},
     worker_prefetch_multiplier=1,
     task_acks_late=True,
+    # Set to run tasks inline, e.g. with memory:// broker and cache+memory:// backend in tests
+    task_always_eager=os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true',
+    task_store_eager_result=True,
+)
+
+# Redis client for task management (memory:// selects an in-process stand-in)
+redis_client = create_redis_client(
+    os.getenv('REDIS_URL', os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
 )
 
-# Redis client for task management
-redis_client = redis.Redis.from_url(os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+# JSON status/result records readable by the API without going through Celery
+result_store = ResultStore(redis_client)
+
+def report_progress(task, task_id: str, message: str, progress: int):
+    """Publish progress both to Celery state and to the result store"""
+    task.update_state(state='PROCESSING', meta={'status': message, 'progress': progress})
+    result_store.set_status(task_id, 'PROCESSING', progress, message)
 
-@celery_app.task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 60})
-def analyze_document_async(self, file_path: str, query: str, task_id: str):
+def remove_upload(file_path: str):
+    """Delete an upload once no further attempt will read it"""
+    if os.path.exists(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+@celery_app.task(bind=True, max_retries=ANALYSIS_MAX_RETRIES)
+def analyze_document_async(self, file_path: str, query: str, task_id: str,
+                           user_id: int = None, tier: str = 'free'):
     """
     Asynchronous task for analyzing financial documents
+
+    Each finished stage (document figures, every agent's output) is
+    checkpointed, so a retry resumes after the last one. Extracted page
+    text is already kept in the on-disk document cache. Permanent errors
+    such as an unreadable PDF fail at once; transient ones are retried
+    with exponential backoff and jitter.
     
     Args:
         file_path (str): Path to the uploaded document
         query (str): User's analysis query
         task_id (str): Unique task identifier
+        user_id (int): User the LLM calls are scheduled for, if known
+        tier (str): That user's subscription tier
         
     Returns:
         dict: Analysis results with status and data
     """
+    # Import here to avoid circular imports
+    from main import run_crew_cached, checkpoint_stages
+
+    checkpoints = JobCheckpoints(result_store, task_id)
     try:
         # Update task status
-        self.update_state(
-            state='PROCESSING',
-            meta={'status': 'Reading document...', 'progress': 25}
-        )
-        
-        # Import here to avoid circular imports
-        from main import run_crew
+        resuming = self.request.retries > 0
+        report_progress(self, task_id, 'Resuming analysis...' if resuming else 'Reading document...', 25)
         
         # Update progress
-        self.update_state(
-            state='PROCESSING', 
-            meta={'status': 'Analyzing with AI agents...', 'progress': 50}
-        )
+        report_progress(self, task_id, 'Analyzing with AI agents...', 50)
         
         # Run the analysis
-        result = run_crew(query=query, file_path=file_path)
+        with metrics.stage('job_analysis', retries=self.request.retries):
+            result = run_crew_cached(
+                query=query, file_path=file_path, user_id=user_id, tier=tier, checkpoints=checkpoints
+            )
         
         # Update progress
-        self.update_state(
-            state='PROCESSING',
-            meta={'status': 'Finalizing results...', 'progress': 90}
-        )
+        report_progress(self, task_id, 'Finalizing results...', 90)
         
         # Store result in Redis for retrieval
         analysis_result = {
@@ -77,8 +109,12 @@ def analyze_document_async(self, file_path: str, query: str, task_id: str):
             'progress': 100
         }
         
-        # Cache result for 1 hour
-        redis_client.setex(f'analysis_result:{task_id}', 3600, str(analysis_result))
+        # Store status and result together for 1 hour
+        result_store.set_result(task_id, analysis_result, 'SUCCESS')
+        checkpoints.clear(checkpoint_stages())
+
+        # The upload is no longer needed once the analysis is stored
+        remove_upload(file_path)
         
         return analysis_result
         
@@ -89,16 +125,42 @@ def analyze_document_async(self, file_path: str, query: str, task_id: str):
             'error': str(exc),
             'task_id': task_id
         }
+
+        if is_permanent(exc) or self.request.retries >= self.max_retries:
+            metrics.count('job_failed')
+            result_store.set_result(task_id, error_result, 'FAILURE')
+            checkpoints.clear(checkpoint_stages())
+            remove_upload(file_path)
+            raise
+
+        metrics.count('job_retried')
+        countdown = backoff_delay(exc, self.request.retries)
+        error_result['retry_in'] = round(countdown, 1)
+        result_store.set_result(task_id, error_result, 'RETRY')
         
-        redis_client.setex(f'analysis_result:{task_id}', 3600, str(error_result))
-        
-        raise self.retry(exc=exc)
+        raise self.retry(exc=exc, countdown=countdown)
+
+# Load the crew stack once in the parent so prefork children share it copy-on-write
+CELERY_WARMUP = os.getenv('CELERY_WARMUP', 'true').lower() == 'true'
+
+@worker_init.connect
+def warmup_worker(**kwargs):
+    """Import and build agents and tasks before the pool forks"""
+    if CELERY_WARMUP:
+        from main import warmup
+        warmup()
+
+@worker_process_init.connect
+def start_worker_metrics(**kwargs):
+    """Expose each pool process's metrics on METRICS_WORKER_PORT + its pool index"""
+    if metrics.METRICS_ENABLED and metrics.METRICS_WORKER_PORT:
+        from billiard.process import current_process
+        metrics.start_metrics_server(metrics.METRICS_WORKER_PORT + (current_process().index or 0))
 
 @celery_app.task
 def cleanup_old_files():
     """Periodic task to cleanup old uploaded files"""
     import glob
-    import time
     
     # Remove files older than 1 hour
     cutoff_time = time.time() - 3600
@@ -111,6 +173,10 @@ def cleanup_old_files():
             except OSError:
                 pass
 
+    # Drop expired web search responses from the on-disk search cache
+    from search_cache import search_cache
+    search_cache.store.purge_expired()
+
 @celery_app.task
 def health_check():
     """Health check task for monitoring"""
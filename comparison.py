@@ -0,0 +1,162 @@
+## Multi-company comparison over extracted statement metrics
+import os
+from dotenv import load_dotenv
+load_dotenv()
+
+import pandas as pd
+
+from document_cache import document_cache
+from extraction import read_document_text, get_process_pool
+from financial_metrics import (
+    extract_statements, to_panel, compute_panel_ratios, format_ratio, RATIO_LABELS, PERCENT_RATIOS
+)
+
+MAX_COMPARE_DOCUMENTS = int(os.getenv('MAX_COMPARE_DOCUMENTS', '10'))
+
+# Ratios where a smaller value ranks better
+LOWER_IS_BETTER = {"debt_to_equity", "liabilities_to_equity"}
+
+
+def document_statements(path: str, digest: str = None) -> pd.DataFrame:
+    """Extract one document's statement frame (runs inside an extraction worker process)"""
+    # Already inside a pool worker, so pages are read sequentially here
+    return extract_statements(read_document_text(path, digest, workers=1))
+
+
+def extract_many(documents: dict) -> dict:
+    """Extract statement frames for several documents in parallel
+
+    Args:
+        documents (dict): Document name -> pdf path.
+
+    Returns:
+        dict: Document name -> line item x period frame
+    """
+    pool = get_process_pool()
+    digests = {name: document_cache.digest(path) for name, path in documents.items()}
+    futures = {
+        name: pool.submit(document_statements, path, digests[name])
+        for name, path in documents.items()
+    }
+    frames = {name: future.result() for name, future in futures.items()}
+    # The workers wrote the cache entries; account for them (and evict) in this process
+    for digest in set(digests.values()):
+        document_cache.commit(digest)
+    return frames
+
+
+def _latest(values: pd.DataFrame) -> pd.Series:
+    """Most recent reported value per document"""
+    return values.ffill(axis=1).iloc[:, -1]
+
+
+def _previous_reported(values: pd.DataFrame) -> pd.Series:
+    """Second most recent reported value per document"""
+    return values.apply(lambda row: row.dropna().iloc[-2] if row.count() >= 2 else float("nan"), axis=1)
+
+
+def compare_panel(panel_ratios: pd.DataFrame) -> dict:
+    """Peer table, rankings and period-over-period deltas for every ratio at once
+
+    Returns:
+        dict: 'latest', 'peer_median', 'vs_peer_median', 'rank' and 'delta' frames,
+            each with documents as rows and ratios as columns
+    """
+    ratio_names = [name for name in RATIO_LABELS if name in panel_ratios.columns.get_level_values("ratio")]
+    latest = pd.DataFrame({name: _latest(panel_ratios[name]) for name in ratio_names})
+    previous = pd.DataFrame({name: _previous_reported(panel_ratios[name]) for name in ratio_names})
+    peer_median = latest.median()
+    ascending = [name in LOWER_IS_BETTER for name in ratio_names]
+    rank = pd.DataFrame({
+        name: latest[name].rank(ascending=lower_better, method="min")
+        for name, lower_better in zip(ratio_names, ascending)
+    })
+    return {
+        "latest": latest,
+        "peer_median": peer_median,
+        "vs_peer_median": latest - peer_median,
+        "rank": rank,
+        "delta": latest - previous,
+    }
+
+
+def format_delta(name: str, value: float) -> str:
+    if name in PERCENT_RATIOS:
+        return f"{value * 100:+.1f} pts"
+    return f"{value:+.2f}x"
+
+
+def comparison_table(comparison: dict) -> str:
+    """Plain-text table of latest ratios, peer rank and change for the LLM prompt"""
+    latest = comparison["latest"]
+    lines = []
+    for name in latest.columns:
+        lines.append(f"{RATIO_LABELS[name]} (peer median {format_ratio(name, comparison['peer_median'][name])}):")
+        for document in latest.index:
+            value = latest.at[document, name]
+            if pd.isna(value):
+                continue
+            delta = comparison["delta"].at[document, name]
+            change = "" if pd.isna(delta) else f", change vs prior period {format_delta(name, delta)}"
+            lines.append(
+                f"  - {document}: {format_ratio(name, value)} "
+                f"(rank {int(comparison['rank'].at[document, name])}{change})"
+            )
+    return "\n".join(lines)
+
+
+def comparison_to_dict(comparison: dict) -> dict:
+    """JSON-friendly view of a comparison (NaN becomes None)"""
+    def clean(frame):
+        return frame.astype(object).where(frame.notna(), None).to_dict(orient="index")
+
+    return {
+        "latest": clean(comparison["latest"]),
+        "rank": clean(comparison["rank"]),
+        "delta": clean(comparison["delta"]),
+        "vs_peer_median": clean(comparison["vs_peer_median"]),
+        "peer_median": {
+            name: (None if pd.isna(value) else value) for name, value in comparison["peer_median"].items()
+        },
+    }
+
+
+def summarize_comparison(query: str, table: str, llm=None) -> str:
+    """Single LLM call that interprets the precomputed comparison"""
+    if llm is None:
+        from agents import llm
+    prompt = (
+        "You are a senior financial analyst comparing companies from their filings. "
+        "All figures below were computed directly from the documents; do not recompute or invent numbers.\n\n"
+        f"Question: {query}\n\n"
+        f"Comparison (latest reported period per company, rank 1 is best):\n{table}\n\n"
+        "Write a concise comparative analysis: relative strengths and weaknesses, notable changes, "
+        "key risks, and how the companies rank overall for the question asked."
+    )
+    response = llm.invoke(prompt)
+    return getattr(response, "content", str(response))
+
+
+def compare_documents(documents: dict, query: str, llm=None) -> dict:
+    """Extract, compare and summarize several filings
+
+    Args:
+        documents (dict): Document name -> pdf path.
+        query (str): What the user wants the comparison to focus on.
+
+    Returns:
+        dict: 'comparison' metrics, 'summary' text and the documents that yielded no tables
+    """
+    frames = extract_many(documents)
+    unparsed = [name for name, frame in frames.items() if frame.empty]
+    panel = to_panel(frames)
+    if panel.empty:
+        return {"comparison": None, "summary": None, "unparsed_documents": unparsed}
+
+    comparison = compare_panel(compute_panel_ratios(panel))
+    summary = summarize_comparison(query, comparison_table(comparison), llm)
+    return {
+        "comparison": comparison_to_dict(comparison),
+        "summary": summary,
+        "unparsed_documents": unparsed,
+    }
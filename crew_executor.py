@@ -0,0 +1,78 @@
+## Bounded executor for running crews off the event loop
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+CREW_MAX_CONCURRENCY = int(os.getenv('CREW_MAX_CONCURRENCY', '4'))
+CREW_MAX_QUEUE = int(os.getenv('CREW_MAX_QUEUE', '16'))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when both the running slots and the waiting queue are full"""
+
+    def __init__(self, running: int, queued: int, retry_after: int = 30):
+        super().__init__(f"Analysis capacity exhausted ({running} running, {queued} queued)")
+        self.running = running
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+class CrewExecutor:
+    """Runs blocking crew calls in a thread pool with admission control
+
+    At most ``max_concurrency`` calls run at once and at most ``max_queue``
+    more wait for a slot. Anything beyond that is rejected immediately with
+    ExecutorSaturated instead of piling up behind the event loop.
+    """
+
+    def __init__(self, max_concurrency: int = CREW_MAX_CONCURRENCY, max_queue: int = CREW_MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='crew')
+        self._lock = threading.Lock()
+        self._running = 0
+        self._queued = 0
+
+    def _admit(self):
+        with self._lock:
+            if self._running + self._queued >= self.max_concurrency + self.max_queue:
+                raise ExecutorSaturated(self._running, self._queued)
+            self._queued += 1
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        return fn(*args, **kwargs)
+
+    def _release(self, future):
+        """Free the slot of a finished job; a job cancelled while queued never reached _call"""
+        with self._lock:
+            if future.cancelled():
+                self._queued -= 1
+            else:
+                self._running -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) on a worker thread, or raise ExecutorSaturated"""
+        self._admit()
+        future = self._pool.submit(self._call, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        # Cancelling the awaiting request cancels a job that is still queued; a running
+        # job finishes on its thread. Either way _release frees the slot.
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': self._queued,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,235 @@
+## Reusable pool of pre-built crews
+import os
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+load_dotenv()
+
+import metrics
+from rate_limiter import copy_llm, current_llm_user
+
+logger = logging.getLogger(__name__)
+
+CREW_POOL_SIZE = int(os.getenv('CREW_POOL_SIZE', os.getenv('CREW_MAX_CONCURRENCY', '4')))
+VERBOSE = os.getenv('APP_ENV', 'development') != 'production'
+
+
+class CrewPool:
+    """Per-process pool of crews built once and reused across requests
+
+    Each pooled crew owns private copies of its agents and tasks, so two
+    requests never share agent state. Crews are built lazily up to
+    ``size`` and returned to the pool after every run with their
+    short-lived state cleared. Each copied agent also gets its own
+    rate-limited LLM, pinned to the requesting user for the duration of a
+    run so calls from task threads crewai starts itself (async tasks) are
+    still charged to that user.
+
+    When given a job's checkpoints, every finished task's output is saved
+    as it completes, and a rerun of that job only executes the tasks that
+    have no saved output yet.
+
+    Instead of agents and tasks a ``loader`` returning ``(agents, tasks)``
+    can be passed; it is called on first use, so importing the module that
+    declares the pool does not import crewai or build any agent.
+    """
+
+    def __init__(self, agents=None, tasks=None, size: int = CREW_POOL_SIZE, process=None,
+                 verbose: bool = VERBOSE, name: str = 'crew', loader=None):
+        self.name = name
+        self._agents = agents
+        self._tasks = tasks
+        self._loader = loader
+        self.size = size
+        self.process = process
+        self.verbose = verbose
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._built = 0
+        self._construction_seconds = 0.0
+        self._execution_seconds = 0.0
+        self._runs = 0
+
+    def load(self):
+        """Import and build the agents and tasks now rather than on first use"""
+        with self._lock:
+            if self._loader is not None:
+                self._agents, self._tasks = self._loader()
+                self._loader = None
+
+    @property
+    def agents(self) -> list:
+        self.load()
+        return self._agents
+
+    @property
+    def tasks(self) -> list:
+        self.load()
+        return self._tasks
+
+    @property
+    def stages(self) -> list:
+        """Checkpoint stage name of each task, in task order"""
+        return [f'{self.name}:task{index}' for index in range(len(self.tasks))]
+
+    def _build(self, completed: dict = None) -> 'Crew':
+        """Copy agents and tasks into a new crew
+
+        Tasks in ``completed`` (stage -> raw output) get that output attached
+        and are left out of the crew; later tasks still read them as context.
+        """
+        from crewai import Crew, Process
+        from crewai.tasks.task_output import TaskOutput
+
+        if metrics.METRICS_ENABLED:
+            metrics.install_llm_logger()
+        started = time.perf_counter()
+        completed = completed or {}
+        agents = [agent.copy() for agent in self.agents]
+        for agent in agents:
+            agent.llm = copy_llm(agent.llm)
+        task_mapping = {}
+        tasks = []
+        for task, stage in zip(self.tasks, self.stages):
+            copied = task.copy(agents, task_mapping)
+            task_mapping[task.key] = copied
+            if stage in completed:
+                copied.output = TaskOutput(
+                    description=copied.description,
+                    expected_output=copied.expected_output,
+                    agent=copied.agent.role if copied.agent else '',
+                    raw=completed[stage],
+                )
+            else:
+                tasks.append(copied)
+        crew = Crew(agents=agents, tasks=tasks, process=self.process or Process.sequential, verbose=self.verbose)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._construction_seconds += elapsed
+        logger.info("Built pooled crew in %.3fs", elapsed)
+        return crew
+
+    @staticmethod
+    def _reset(crew: 'Crew'):
+        """Drop per-request state so the next user starts clean"""
+        for agent in crew.agents:
+            agent.tools_results = []
+            if hasattr(agent.llm, 'pin'):
+                agent.llm.pin(None)
+        for task in crew.tasks:
+            task.callback = None
+        if crew.memory:
+            crew.reset_memories(command_type='short')
+            crew.reset_memories(command_type='entity')
+
+    @contextmanager
+    def acquire(self):
+        """Check a crew out of the pool, building one if none is idle and the pool is not full"""
+        try:
+            crew = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_build = self._built < self.size
+                if can_build:
+                    self._built += 1
+            if can_build:
+                try:
+                    crew = self._build()
+                except Exception:
+                    with self._lock:
+                        self._built -= 1
+                    raise
+            else:
+                crew = self._idle.get()
+        try:
+            yield crew
+        finally:
+            self._reset(crew)
+            self._idle.put(crew)
+
+    @staticmethod
+    def _token_usage(crew: 'Crew') -> list:
+        """Cumulative (prompt, completion) tokens of each agent in the crew"""
+        usage = []
+        for agent in crew.agents:
+            summary = agent._token_process.get_summary()
+            usage.append((summary.prompt_tokens, summary.completion_tokens))
+        return usage
+
+    def _kickoff(self, crew: 'Crew', inputs: dict):
+        """Kick off crew, timing it and attributing the tokens it used to each agent"""
+        user = current_llm_user()
+        for agent in crew.agents:
+            if hasattr(agent.llm, 'pin'):
+                agent.llm.pin(user)
+        if not metrics.METRICS_ENABLED:
+            return crew.kickoff(inputs)
+        before = self._token_usage(crew)
+        with metrics.stage('crew_kickoff', crew=self.name):
+            result = crew.kickoff(inputs)
+        for agent, (prompt_before, completion_before), (prompt_after, completion_after) in zip(
+            crew.agents, before, self._token_usage(crew)
+        ):
+            metrics.record_agent_tokens(
+                agent.role, prompt_after - prompt_before, completion_after - completion_before
+            )
+        return result
+
+    @staticmethod
+    def _checkpoint_tasks(crew: 'Crew', stages: list, checkpoints):
+        """Save each task's raw output under its stage as soon as the task finishes"""
+        for task, stage in zip(crew.tasks, stages):
+            task.callback = lambda output, stage=stage: checkpoints.save(stage, output.raw)
+
+    def kickoff(self, inputs: dict, checkpoints=None):
+        """Run a pooled crew with inputs and record its execution time
+
+        Args:
+            inputs (dict): Crew inputs.
+            checkpoints (JobCheckpoints): Optional per-job store of finished task outputs.
+        """
+        completed = checkpoints.load(self.stages) if checkpoints is not None else {}
+        if completed:
+            return self._resume(inputs, checkpoints, completed)
+
+        with self.acquire() as crew:
+            if checkpoints is not None:
+                self._checkpoint_tasks(crew, self.stages, checkpoints)
+            started = time.perf_counter()
+            result = self._kickoff(crew, inputs)
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self._execution_seconds += elapsed
+            self._runs += 1
+        logger.info("Crew execution took %.2fs", elapsed)
+        return result
+
+    def _resume(self, inputs: dict, checkpoints, completed: dict):
+        """Rerun only the unfinished tasks on a one-off crew (pooled crews keep every task)"""
+        remaining = [stage for stage in self.stages if stage not in completed]
+        logger.info("Resuming %s crew: %d of %d tasks already done", self.name, len(completed), len(self.stages))
+        if not remaining:
+            return completed[self.stages[-1]]
+        crew = self._build(completed)
+        self._checkpoint_tasks(crew, remaining, checkpoints)
+        started = time.perf_counter()
+        result = self._kickoff(crew, inputs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._execution_seconds += elapsed
+            self._runs += 1
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'built': self._built,
+                'idle': self._idle.qsize(),
+                'runs': self._runs,
+                'construction_seconds': self._construction_seconds,
+                'execution_seconds': self._execution_seconds,
+                'avg_execution_seconds': self._execution_seconds / self._runs if self._runs else 0.0,
+            }
@@ -0,0 +1,106 @@
+# Async variant of the database helpers for the FastAPI request path
+
+import os
+import threading
+from sqlalchemy import select
+from sqlalchemy.orm import Query
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from dotenv import load_dotenv
+
+from database import (
+    DATABASE_URL, DB_ECHO, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT,
+    Base, AnalysisResult, LazySessionFactory, history_page_query, split_history_page
+)
+
+load_dotenv()
+
+ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL')
+
+def to_async_url(url: str) -> str:
+    """Swap the sync driver in a database URL for its asyncio counterpart"""
+    if url.startswith('postgresql+asyncpg://') or url.startswith('sqlite+aiosqlite://'):
+        return url
+    if url.startswith('postgresql'):
+        return 'postgresql+asyncpg://' + url.split('://', 1)[1]
+    if url.startswith('sqlite'):
+        return 'sqlite+aiosqlite://' + url.split('://', 1)[1]
+    return url
+
+def create_async_db_engine(url: str = None):
+    """Async engine with the same pool settings as the sync engine"""
+    url = to_async_url(url or ASYNC_DATABASE_URL or DATABASE_URL)
+    if url.startswith('sqlite'):
+        return create_async_engine(url, echo=DB_ECHO)
+    return create_async_engine(
+        url,
+        echo=DB_ECHO,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+
+_async_engine = None
+_async_engine_lock = threading.Lock()
+
+def get_async_engine():
+    """Async engine, created on first use so importing this module needs no driver"""
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is None:
+            _async_engine = create_async_db_engine()
+        return _async_engine
+
+AsyncSessionLocal = LazySessionFactory(
+    lambda: async_sessionmaker(get_async_engine(), expire_on_commit=False, autoflush=False)
+)
+
+# Async database utility functions
+async def get_db() -> AsyncSession:
+    """Dependency to get an async database session"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def create_tables():
+    """Create all database tables"""
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def save_analysis_result(db: AsyncSession, task_id: str, user_id: int, file_name: str,
+                               query: str, analysis: str, processing_time: float, status: str = "completed"):
+    """Save analysis result to database"""
+    db_result = AnalysisResult(
+        task_id=task_id,
+        user_id=user_id,
+        file_name=file_name,
+        original_query=query,
+        analysis_text=analysis,
+        processing_time=processing_time,
+        status=status
+    )
+    db.add(db_result)
+    await db.commit()
+    await db.refresh(db_result)
+    return db_result
+
+async def get_analysis_result(db: AsyncSession, task_id: str):
+    """Retrieve analysis result by task ID"""
+    result = await db.execute(select(AnalysisResult).where(AnalysisResult.task_id == task_id))
+    return result.scalars().first()
+
+async def get_user_analysis_history(db: AsyncSession, user_id: int, limit: int = 10):
+    """Get user's analysis history"""
+    result = await db.execute(
+        select(AnalysisResult)
+        .where(AnalysisResult.user_id == user_id)
+        .order_by(AnalysisResult.created_at.desc())
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_user_analysis_history_page(db: AsyncSession, user_id: int, limit: int = 20, cursor: str = None):
+    """Get one keyset-paginated page of a user's analysis history, newest first"""
+    statement = history_page_query(Query(AnalysisResult), user_id, limit, cursor).statement
+    result = await db.execute(statement)
+    return split_history_page(result.scalars().all(), limit)
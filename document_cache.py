@@ -0,0 +1,247 @@
+## Content-addressed cache for extracted financial documents
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv('DOCUMENT_CACHE_DIR', 'data/cache')
+CACHE_MAX_BYTES = int(os.getenv('DOCUMENT_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Uploads land on fresh UUID paths, so the path -> digest memo must not grow without bound
+DIGEST_MEMO_ENTRIES = 4096
+
+
+def file_digest(path: str) -> str:
+    """Compute the SHA-256 hex digest of a file's bytes"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _tree_size(path: str) -> int:
+    """Total size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class DocumentCache:
+    """Disk cache of extracted document pages keyed by content hash
+
+    Each entry lives in its own directory named after the SHA-256 of the
+    original PDF bytes, so the same filing uploaded under a new UUID filename
+    maps to the same entry. Entries are evicted least-recently-used once the
+    cache grows past ``max_bytes``.
+
+    The directory is shared by the API, Celery workers and extraction pool
+    processes, so the on-disk entries are authoritative: an entry written by
+    another process is adopted on lookup, and eviction re-measures the whole
+    directory before deciding what to delete.
+    """
+
+    PAGES_FILE = 'pages.jsonl'
+    MANIFEST_FILE = 'manifest.json'
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        # digest -> size in bytes, ordered from least to most recently used
+        self._entries = OrderedDict()
+        # (path, mtime, size) -> digest, so repeated reads of one file hash it once (LRU-bounded)
+        self._digests = OrderedDict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_manifest()
+
+    ## Bookkeeping
+    def _manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, self.MANIFEST_FILE)
+
+    def _load_manifest(self):
+        """Rebuild the LRU order from the manifest, falling back to a directory scan"""
+        try:
+            with open(self._manifest_path()) as f:
+                order = json.load(f)
+        except (OSError, ValueError):
+            order = []
+        present = {
+            name for name in os.listdir(self.cache_dir)
+            if os.path.isdir(os.path.join(self.cache_dir, name))
+        }
+        for digest in order:
+            if digest in present:
+                self._entries[digest] = _tree_size(self._entry_dir(digest))
+                present.discard(digest)
+        for digest in sorted(present):
+            self._entries[digest] = _tree_size(self._entry_dir(digest))
+
+    def _save_manifest(self):
+        """Persist the LRU order; best effort, since it is only a hint for the next start"""
+        # Every process sharing the directory writes the manifest, so each needs its own tmp file
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self._entries), f)
+            os.replace(tmp_path, self._manifest_path())
+        except OSError as e:
+            logger.warning("Could not save document cache manifest: %s", e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _entry_dir(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def _touch(self, digest: str):
+        # Hits only reorder in memory; the order is persisted on the next commit
+        self._entries.move_to_end(digest)
+
+    def _rescan(self):
+        """Sync entries and sizes with what is actually on disk
+
+        Entries other processes wrote are adopted as most recently used
+        (oldest first), and entries another process evicted are dropped.
+        """
+        entry_dirs = {}
+        for name in os.listdir(self.cache_dir):
+            path = self._entry_dir(name)
+            if os.path.isdir(path):
+                try:
+                    entry_dirs[name] = os.path.getmtime(path)
+                except OSError:
+                    pass
+        for digest in list(self._entries):
+            if digest not in entry_dirs:
+                del self._entries[digest]
+        for digest in sorted(set(entry_dirs) - set(self._entries), key=entry_dirs.get):
+            self._entries[digest] = 0
+        for digest in self._entries:
+            self._entries[digest] = _tree_size(self._entry_dir(digest))
+
+    def _evict(self, keep: str = None):
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        self._rescan()
+        total = sum(self._entries.values())
+        for digest in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            total -= self._entries.pop(digest)
+            shutil.rmtree(self._entry_dir(digest), ignore_errors=True)
+        self._save_manifest()
+
+    ## Public API
+    def digest(self, path: str) -> str:
+        """Content hash of the file at path, memoized on (path, mtime, size)"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._digests.get(key)
+            if cached:
+                self._digests.move_to_end(key)
+        if cached:
+            return cached
+        digest = file_digest(path)
+        self._remember_digest(key, digest)
+        return digest
+
+    def register_digest(self, path: str, digest: str):
+        """Record a digest computed elsewhere (e.g. while streaming an upload)"""
+        stat = os.stat(path)
+        self._remember_digest((os.path.abspath(path), stat.st_mtime_ns, stat.st_size), digest)
+
+    def _remember_digest(self, key: tuple, digest: str):
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > DIGEST_MEMO_ENTRIES:
+                self._digests.popitem(last=False)
+
+    def iter_pages(self, digest: str):
+        """Return an iterator of cached page dicts for digest, or None on a miss"""
+        pages_path = os.path.join(self._entry_dir(digest), self.PAGES_FILE)
+        with self._lock:
+            if not os.path.exists(pages_path):
+                self._entries.pop(digest, None)
+                self.misses += 1
+                return None
+            if digest not in self._entries:
+                # Written by another process (e.g. a worker or an extraction pool child)
+                self._entries[digest] = _tree_size(self._entry_dir(digest))
+            self.hits += 1
+            self._touch(digest)
+        return self._read_pages(pages_path)
+
+    @staticmethod
+    def _read_pages(pages_path: str):
+        with open(pages_path, encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    @contextmanager
+    def page_writer(self, digest: str):
+        """Context manager yielding a callable that appends one page dict to the entry
+
+        The pages file is only published if the block completes, so an
+        interrupted extraction leaves no partial entry behind.
+        """
+        entry_dir = self._entry_dir(digest)
+        os.makedirs(entry_dir, exist_ok=True)
+        pages_path = os.path.join(entry_dir, self.PAGES_FILE)
+        tmp_path = f"{pages_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        f = open(tmp_path, 'w', encoding='utf-8')
+        try:
+            yield lambda page: f.write(json.dumps(page) + '\n')
+            f.close()
+            os.replace(tmp_path, pages_path)
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        self.commit(digest)
+
+    def commit(self, digest: str):
+        """Re-measure an entry after something was written into it"""
+        with self._lock:
+            self._entries[digest] = _tree_size(self._entry_dir(digest))
+            self._entries.move_to_end(digest)
+            self._evict(keep=digest)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current footprint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+
+## Shared process-wide cache
+document_cache = DocumentCache()
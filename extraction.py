@@ -0,0 +1,318 @@
+## Streaming page-by-page PDF extraction
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+
+import metrics
+from document_cache import document_cache
+from normalization import normalize_whitespace
+
+logger = logging.getLogger(__name__)
+
+## Section headings commonly found in annual reports and quarterly updates
+SECTION_PATTERNS = [
+    ("income_statement", re.compile(
+        r"(statements?\s+of\s+(consolidated\s+)?(operations|income|earnings)|income\s+statements?)", re.I)),
+    ("balance_sheet", re.compile(
+        r"(balance\s+sheets?|statements?\s+of\s+financial\s+position)", re.I)),
+    ("cash_flow", re.compile(r"statements?\s+of\s+(consolidated\s+)?cash\s+flows?", re.I)),
+    ("mdna", re.compile(r"management.s\s+discussion\s+and\s+analysis", re.I)),
+    ("risk_factors", re.compile(r"\brisk\s+factors\b", re.I)),
+    ("notes", re.compile(r"notes\s+to\s+(the\s+)?(consolidated\s+)?financial\s+statements", re.I)),
+]
+
+## Parallel extraction settings
+EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '50'))
+PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '16'))
+
+# Only short lines near the top of a page are treated as headings
+HEADING_SCAN_LINES = 8
+HEADING_MAX_LENGTH = 120
+
+
+@dataclass
+class Page:
+    """One extracted page of a financial document"""
+    number: int
+    text: str
+    section: str = "general"
+    # SHA-256 of the cleaned text; pages with equal text hash equal whichever file they came from
+    content_hash: str = ""
+    # SHA-256 of the raw content stream and fonts, only set by extract_pages_incremental
+    fingerprint: str = ""
+
+    def __post_init__(self):
+        if not self.content_hash:
+            self.content_hash = hashlib.sha256(self.text.encode('utf-8')).hexdigest()
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def detect_section(text: str, current: str = "general") -> str:
+    """Return the section a page belongs to, carrying the previous section forward"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in lines[:HEADING_SCAN_LINES]:
+        if len(line) > HEADING_MAX_LENGTH:
+            continue
+        for name, pattern in SECTION_PATTERNS:
+            if pattern.search(line):
+                return name
+    return current
+
+
+def clean_page_text(text: str) -> str:
+    """Normalize whitespace within a single page"""
+    return normalize_whitespace(text)
+
+
+def extract_pages(path: str, start: int = 0, stop: int = None):
+    """Lazily yield Page objects straight from PyPDF2
+
+    Only one page's text is held at a time, so memory stays bounded no
+    matter how long the filing is.
+
+    Args:
+        path (str): Path of the pdf file.
+        start (int, optional): Zero-based index of the first page to read.
+        stop (int, optional): Zero-based index to stop before. Defaults to the last page.
+
+    Yields:
+        Page: Page number (1-based), cleaned text and detected section
+    """
+    import PyPDF2
+
+    section = "general"
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            text = clean_page_text(reader.pages[index].extract_text())
+            section = detect_section(text, section)
+            yield Page(number=index + 1, text=text, section=section)
+
+
+def page_fingerprint(page) -> str:
+    """Hash of a PyPDF2 page's content stream and resources, computed without extracting text
+
+    Two pages with the same fingerprint extract to the same text, so the
+    text stored for one can be reused for the other. Form XObjects are
+    hashed with their own resources, since pages drawn through one
+    (``/Fm0 Do``) share an identical content stream.
+    """
+    sha = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        sha.update(contents.get_data())
+    _hash_resources(sha, page.get('/Resources'), set())
+    return sha.hexdigest()
+
+
+def _hash_resources(sha, resources, seen: set):
+    """Add font encodings and form XObjects (recursively) of a resource dictionary to sha"""
+    resources = resources.get_object() if resources is not None else {}
+    fonts = resources.get('/Font')
+    fonts = fonts.get_object() if fonts is not None else {}
+    for name in sorted(fonts):
+        font = fonts[name].get_object()
+        sha.update(f"{name}={font.get('/BaseFont')}".encode('utf-8'))
+        to_unicode = font.get('/ToUnicode')
+        if to_unicode is not None:
+            sha.update(to_unicode.get_object().get_data())
+    xobjects = resources.get('/XObject')
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    for name in sorted(xobjects):
+        xobject = xobjects[name].get_object()
+        sha.update(f"{name}={xobject.get('/Subtype')}".encode('utf-8'))
+        # Images carry no text; forms can nest and refer back to each other
+        if xobject.get('/Subtype') != '/Form' or id(xobject) in seen:
+            continue
+        seen.add(id(xobject))
+        sha.update(xobject.get_data())
+        _hash_resources(sha, xobject.get('/Resources'), seen)
+
+
+def extract_pages_incremental(path: str, lookup, report: dict = None) -> list:
+    """Extract a document, reusing stored text for pages that have been extracted before
+
+    Every page is fingerprinted first, ``lookup`` maps the fingerprints it
+    already knows to their text, and only the remaining pages go through
+    text extraction. Section detection reruns over the whole sequence since
+    a changed heading moves the pages after it into another section.
+
+    Args:
+        path (str): Path of the pdf file.
+        lookup (callable): Takes a list of fingerprints, returns {fingerprint: text}.
+        report (dict, optional): Filled with 'reused' and 'extracted' page counts.
+
+    Returns:
+        list: Page objects in document order, with fingerprints set
+    """
+    import PyPDF2
+
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        fingerprints = [page_fingerprint(page) for page in reader.pages]
+        known = dict(lookup(fingerprints))
+        pages = []
+        extracted = 0
+        section = "general"
+        for index, fingerprint in enumerate(fingerprints):
+            text = known.get(fingerprint)
+            if text is None:
+                # Repeated pages (e.g. blank separators) are still only extracted once
+                text = known[fingerprint] = clean_page_text(reader.pages[index].extract_text())
+                extracted += 1
+            section = detect_section(text, section)
+            pages.append(Page(number=index + 1, text=text, section=section, fingerprint=fingerprint))
+
+    elapsed = time.perf_counter() - started
+    metrics.observe('pdf_extract', elapsed)
+    logger.info("Extracted %d of %d pages from %s in %.2fs, reused the rest",
+                extracted, len(pages), path, elapsed)
+    if report is not None:
+        report.update({'reused': len(pages) - extracted, 'extracted': extracted})
+    return pages
+
+
+def count_pages(path: str) -> int:
+    """Number of pages in a pdf file"""
+    import PyPDF2
+
+    with open(path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _extract_range(path: str, start: int, stop: int) -> list:
+    """Process-pool worker: extract raw text and timing for pages [start, stop)"""
+    import PyPDF2
+
+    results = []
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for index in range(start, stop):
+            started = time.perf_counter()
+            text = clean_page_text(reader.pages[index].extract_text())
+            results.append((index + 1, text, time.perf_counter() - started))
+    return results
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_process_pool(workers: int = None) -> ProcessPoolExecutor:
+    """Process pool shared across calls so worker start-up is paid once"""
+    global _pool, _pool_workers
+    workers = max(1, workers or EXTRACT_WORKERS)
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def extract_pages_parallel(path: str, workers: int = None, pages_per_task: int = PAGES_PER_TASK,
+                           report: dict = None):
+    """Yield pages in order while page ranges are extracted across a process pool
+
+    At most two ranges per worker are in flight, so memory stays bounded
+    for very long filings. Section detection runs in the parent on the
+    reassembled sequence because it carries state from page to page.
+
+    Args:
+        path (str): Path of the pdf file.
+        workers (int, optional): Number of worker processes. Defaults to PDF_EXTRACT_WORKERS.
+        pages_per_task (int, optional): Pages handed to a worker at a time.
+        report (dict, optional): Filled with 'page_seconds' {page: seconds},
+            'wall_seconds' and 'workers' once the generator is exhausted.
+
+    Yields:
+        Page: Pages in document order
+    """
+    workers = max(1, workers or EXTRACT_WORKERS)
+    total = count_pages(path)
+    ranges = deque(
+        (start, min(start + pages_per_task, total))
+        for start in range(0, total, pages_per_task)
+    )
+    pool = get_process_pool(workers)
+    started = time.perf_counter()
+    page_seconds = {}
+    in_flight = deque()
+    section = "general"
+
+    while ranges or in_flight:
+        while ranges and len(in_flight) < workers * 2:
+            start, stop = ranges.popleft()
+            in_flight.append(pool.submit(_extract_range, path, start, stop))
+        for number, text, seconds in in_flight.popleft().result():
+            page_seconds[number] = seconds
+            section = detect_section(text, section)
+            yield Page(number=number, text=text, section=section)
+
+    wall_seconds = time.perf_counter() - started
+    if page_seconds:
+        slowest = max(page_seconds, key=page_seconds.get)
+        logger.info(
+            "Extracted %d pages from %s with %d workers in %.2fs (cpu %.2fs, slowest page %d: %.2fs)",
+            total, path, workers, wall_seconds, sum(page_seconds.values()), slowest, page_seconds[slowest],
+        )
+    if report is not None:
+        report.update({
+            'page_seconds': page_seconds,
+            'wall_seconds': wall_seconds,
+            'workers': workers,
+        })
+
+
+def stream_pages(path: str, workers: int = None):
+    """Pick sequential or process-pool extraction based on document length"""
+    workers = EXTRACT_WORKERS if workers is None else workers
+    if workers > 1 and count_pages(path) >= PARALLEL_MIN_PAGES:
+        return extract_pages_parallel(path, workers)
+    return extract_pages(path)
+
+
+def iter_document_pages(path: str, digest: str = None, workers: int = None):
+    """Yield pages for a document, served from the document cache when possible
+
+    Pages are written to the cache as they stream past; the entry is only
+    committed once the whole document has been consumed, so a partial read
+    never leaves a truncated cache entry behind.
+    """
+    digest = digest or document_cache.digest(path)
+    cached = document_cache.iter_pages(digest)
+    if cached is not None:
+        yield from (Page(**page) for page in cached)
+        return
+
+    # Only time spent producing pages counts as extraction, not the consumer's work
+    extract_seconds = 0.0
+    with document_cache.page_writer(digest) as write_page:
+        pages = stream_pages(path, workers)
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            extract_seconds += time.perf_counter() - started
+            if page is None:
+                break
+            write_page(page.to_dict())
+            yield page
+    metrics.observe('pdf_extract', extract_seconds)
+
+
+def read_document_text(path: str, digest: str = None, workers: int = None) -> str:
+    """Full document text assembled from the page stream"""
+    return "\n".join(page.text for page in iter_document_pages(path, digest, workers) if page.text)
@@ -0,0 +1,310 @@
+## Deterministic extraction of statement tables and ratio computation
+import re
+
+import numpy as np
+import pandas as pd
+
+## Period headers such as "Q2-2024", "Q2 2025", "FY2024", "FY24" or "2024"
+_PERIOD = re.compile(r"\b(?:(Q[1-4])[\s\-']*(?:FY)?((?:19|20)?\d{2})|FY[\s\-']?((?:19|20)?\d{2})|((?:19|20)\d{2}))\b", re.I)
+
+## Day of month in column headers such as "December 31, 2024" or "Sept. 30"
+_MONTH_DAY = re.compile(r"\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2})\b", re.I)
+
+## Figures such as "25,500", "(1,234)", "-12", "17.2%", "$ 1,172" or "—"
+_NUMBER = re.compile(r"(?<![\w.])\(?-?\$?\s?\d[\d,]*(?:\.\d+)?\)?%?(?![\w])|(?<!\S)[—–-](?!\S)")
+
+# Canonical line items and the labels that identify them (first match wins)
+LINE_ITEMS = [
+    ("revenue", re.compile(r"^(total\s+)?(net\s+)?revenues?$|^total\s+net\s+sales$|^net\s+sales$", re.I)),
+    ("cost_of_revenue", re.compile(r"^(total\s+)?cost\s+of\s+(revenues?|sales)$", re.I)),
+    ("gross_profit", re.compile(r"^(total\s+)?gross\s+(profit|margin)$", re.I)),
+    ("operating_expenses", re.compile(r"^total\s+operating\s+expenses$", re.I)),
+    ("operating_income", re.compile(r"^(income|loss|income\s*\(loss\))\s+from\s+operations$|^operating\s+income", re.I)),
+    ("interest_expense", re.compile(r"^interest\s+expense$", re.I)),
+    ("net_income", re.compile(r"^net\s+income(\s*\(loss\))?(\s+attributable\s+to\s+common\s+stockholders)?(\s*\(gaap\))?$", re.I)),
+    ("operating_cash_flow", re.compile(r"^net\s+cash\s+provided\s+by\s+(\(used\s+in\)\s+)?operating\s+activities$|^operating\s+cash\s+flows?$", re.I)),
+    ("capex", re.compile(r"^capital\s+expenditures$|^purchases\s+of\s+property(,)?\s+(plant\s+)?and\s+equipment", re.I)),
+    ("free_cash_flow", re.compile(r"^free\s+cash\s+flows?$", re.I)),
+    ("cash", re.compile(r"^(total\s+)?cash(,)?\s+(cash\s+equivalents|and\s+cash\s+equivalents)(\s+and\s+(short-term\s+|marketable\s+)?investments)?$", re.I)),
+    ("inventory", re.compile(r"^inventor(y|ies)$", re.I)),
+    ("current_assets", re.compile(r"^total\s+current\s+assets$", re.I)),
+    ("total_assets", re.compile(r"^total\s+assets$", re.I)),
+    ("current_liabilities", re.compile(r"^total\s+current\s+liabilities$", re.I)),
+    ("total_liabilities", re.compile(r"^total\s+liabilities$", re.I)),
+    ("total_debt", re.compile(r"^total\s+debt(\s+and\s+finance\s+leases)?$|^debt\s+and\s+finance\s+leases", re.I)),
+    ("total_equity", re.compile(r"^total\s+(stockholders|shareholders)['’]?\s+equity$|^total\s+equity$", re.I)),
+]
+
+RATIO_LABELS = {
+    "gross_margin": "Gross margin",
+    "operating_margin": "Operating margin",
+    "net_margin": "Net margin",
+    "free_cash_flow_margin": "Free cash flow margin",
+    "revenue_growth": "Revenue growth (sequential)",
+    "revenue_growth_yoy": "Revenue growth (year over year)",
+    "net_income_growth": "Net income growth",
+    "debt_to_equity": "Debt to equity",
+    "liabilities_to_equity": "Liabilities to equity",
+    "current_ratio": "Current ratio",
+    "quick_ratio": "Quick ratio",
+    "interest_coverage": "Interest coverage",
+    "cash_to_assets": "Cash to assets",
+}
+PERCENT_RATIOS = {"gross_margin", "operating_margin", "net_margin", "free_cash_flow_margin",
+                  "revenue_growth", "revenue_growth_yoy", "net_income_growth", "cash_to_assets"}
+
+
+def normalize_period(match) -> str:
+    quarter, quarter_year, fiscal_year, year = match.groups()
+    if quarter:
+        return f"{quarter.upper()}-{_full_year(quarter_year)}"
+    if fiscal_year:
+        return f"FY{_full_year(fiscal_year)}"
+    return year
+
+
+def _full_year(value: str) -> str:
+    return value if len(value) == 4 else f"20{value}"
+
+
+def period_sort_key(period: str):
+    """Chronological order: years first, quarters inside a year, fiscal year totals last"""
+    digits = re.findall(r"\d{4}", period)
+    year = int(digits[0]) if digits else 0
+    if period.startswith("Q"):
+        return (year, int(period[1]))
+    return (year, 5)
+
+
+def parse_number(token: str) -> float:
+    """Convert a statement figure to float; parentheses and dashes mean negative and zero"""
+    token = token.strip()
+    if token in ("-", "—", "–"):
+        return 0.0
+    negative = token.startswith("(") and token.endswith(")") or token.startswith("-")
+    cleaned = re.sub(r"[^\d.]", "", token)
+    if not cleaned:
+        return np.nan
+    value = float(cleaned)
+    return -value if negative else value
+
+
+def match_line_item(label: str):
+    label = re.sub(r"[\s:]+$", "", re.sub(r"\s+", " ", label.strip(" .$")))
+    for name, pattern in LINE_ITEMS:
+        if pattern.search(label):
+            return name
+    return None
+
+
+def is_period_header(line: str, period_matches: list, numbers: list) -> bool:
+    """Two or more period labels and no figures besides the labels themselves and days of the month"""
+    if len(period_matches) < 2:
+        return False
+    labels = [match.span() for match in period_matches]
+    days = {match.start(1) for match in _MONTH_DAY.finditer(line)}
+    for number in numbers:
+        if number.start() in days or any(number.start() < end and start < number.end() for start, end in labels):
+            continue
+        return False
+    return True
+
+
+def extract_statements(text: str) -> pd.DataFrame:
+    """Parse statement tables in extracted text into a line item x period frame
+
+    A line with two or more period labels (and no other figures than days
+    of the month, as in "December 31, 2024") starts a table; each following
+    line that ends in figures is aligned to those periods from the right.
+    Only recognised line items are kept, and where a line item appears
+    in several tables the first value found for a period wins.
+
+    Args:
+        text (str): Extracted document text.
+
+    Returns:
+        pandas.DataFrame: Canonical line items as rows, periods as chronologically ordered columns
+    """
+    periods = []
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        period_matches = list(_PERIOD.finditer(line))
+        numbers = list(_NUMBER.finditer(line))
+        if is_period_header(line, period_matches, numbers):
+            # "Years ended December 31, 2024 and 2023  2024  2023" names each column twice
+            periods = list(dict.fromkeys(normalize_period(match) for match in period_matches))
+            continue
+        if not periods or not numbers:
+            continue
+        label = line[:numbers[0].start()]
+        name = match_line_item(label)
+        if name is None:
+            continue
+        figures = [parse_number(match.group()) for match in numbers if not match.group().endswith("%")]
+        for period, value in zip(periods[-len(figures):], figures[-len(periods):]):
+            values.setdefault(name, {}).setdefault(period, value)
+
+    if not values:
+        return pd.DataFrame()
+    frame = pd.DataFrame.from_dict(values, orient="index")
+    columns = sorted(frame.columns, key=period_sort_key)
+    order = [name for name, _ in LINE_ITEMS if name in frame.index]
+    return frame.loc[order, columns].astype(float)
+
+
+def to_panel(frames: dict) -> pd.DataFrame:
+    """Stack per-document statement frames into one columnar panel
+
+    Args:
+        frames (dict): Document name -> line item x period frame from extract_statements.
+
+    Returns:
+        pandas.DataFrame: One row per document, (line item, period) column MultiIndex
+    """
+    stacked = {name: frame.stack() for name, frame in frames.items() if not frame.empty}
+    if not stacked:
+        return pd.DataFrame()
+    panel = pd.DataFrame(stacked).T
+    panel.columns = panel.columns.set_names(["line_item", "period"])
+    return panel
+
+
+def _periods(panel: pd.DataFrame) -> list:
+    return sorted(panel.columns.get_level_values("period").unique(), key=period_sort_key)
+
+
+def _item(panel: pd.DataFrame, name: str, periods: list) -> pd.DataFrame:
+    """Document x period values of one line item (all NaN when nobody reports it)"""
+    if name in panel.columns.get_level_values("line_item"):
+        return panel[name].reindex(columns=periods).astype(float)
+    return pd.DataFrame(np.nan, index=panel.index, columns=periods)
+
+
+def _safe_divide(numerator: pd.DataFrame, denominator: pd.DataFrame) -> pd.DataFrame:
+    return (numerator / denominator.where(denominator != 0)).replace([np.inf, -np.inf], np.nan)
+
+
+def period_kind(period: str) -> str:
+    return "quarter" if period.startswith("Q") else "year"
+
+
+def _reported(panel: pd.DataFrame, periods: list) -> pd.DataFrame:
+    """Document x period flags for the periods each document reports any line item for"""
+    flags = panel.notna().T.groupby(level="period").any().T
+    return flags.reindex(columns=periods, fill_value=False)
+
+
+def _previous(values: pd.DataFrame, reported: pd.DataFrame) -> pd.DataFrame:
+    """Value of each document's previous reported period of the same kind
+
+    Quarters follow quarters and fiscal years follow fiscal years, and
+    periods only other documents in the panel report are skipped, so an
+    annual filer is not compared against gaps left by a quarterly one.
+    """
+    previous = pd.DataFrame(np.nan, index=values.index, columns=values.columns)
+    for document in values.index:
+        for kind in ("quarter", "year"):
+            columns = [period for period in values.columns
+                       if period_kind(period) == kind and reported.at[document, period]]
+            previous.loc[document, columns] = values.loc[document, columns].shift(1).to_numpy()
+    return previous
+
+
+def prior_year_period(period: str) -> str:
+    """Same quarter (or fiscal year) one year earlier"""
+    return re.sub(r"\d{4}", lambda match: str(int(match.group()) - 1), period, count=1)
+
+
+def compute_panel_ratios(panel: pd.DataFrame) -> pd.DataFrame:
+    """Standard ratios for every document and period in one vectorized pass
+
+    Derives gross profit and free cash flow when only their components
+    are reported. Sequential growth compares each period with the previous
+    period of the same kind (quarter or fiscal year) the document itself
+    reports; year-over-year growth
+    with the same period a year earlier.
+
+    Returns:
+        pandas.DataFrame: One row per document, (ratio, period) column MultiIndex
+    """
+    if panel.empty:
+        return pd.DataFrame()
+
+    periods = _periods(panel)
+    reported = _reported(panel, periods)
+    item = lambda name: _item(panel, name, periods)
+    revenue = item("revenue")
+    net_income = item("net_income")
+    operating_income = item("operating_income")
+    gross_profit = item("gross_profit").fillna(revenue - item("cost_of_revenue"))
+    free_cash_flow = item("free_cash_flow").fillna(item("operating_cash_flow") - item("capex").abs())
+    equity = item("total_equity")
+    current_assets = item("current_assets")
+    current_liabilities = item("current_liabilities")
+
+    prior_year_revenue = revenue.reindex(columns=[prior_year_period(period) for period in periods])
+    prior_year_revenue.columns = periods
+
+    ratios = {
+        "gross_margin": _safe_divide(gross_profit, revenue),
+        "operating_margin": _safe_divide(operating_income, revenue),
+        "net_margin": _safe_divide(net_income, revenue),
+        "free_cash_flow_margin": _safe_divide(free_cash_flow, revenue),
+        "revenue_growth": _safe_divide(revenue - _previous(revenue, reported), _previous(revenue, reported).abs()),
+        "revenue_growth_yoy": _safe_divide(revenue - prior_year_revenue, prior_year_revenue.abs()),
+        "net_income_growth": _safe_divide(net_income - _previous(net_income, reported), _previous(net_income, reported).abs()),
+        "debt_to_equity": _safe_divide(item("total_debt"), equity),
+        "liabilities_to_equity": _safe_divide(item("total_liabilities"), equity),
+        "current_ratio": _safe_divide(current_assets, current_liabilities),
+        "quick_ratio": _safe_divide(current_assets - item("inventory"), current_liabilities),
+        "interest_coverage": _safe_divide(operating_income, item("interest_expense").abs()),
+        "cash_to_assets": _safe_divide(item("cash"), item("total_assets")),
+    }
+    result = pd.concat(ratios, axis=1, names=["ratio", "period"])
+    return result.dropna(axis=1, how="all")
+
+
+def compute_ratios(frame: pd.DataFrame) -> pd.DataFrame:
+    """Standard ratios for a single document
+
+    Returns:
+        pandas.DataFrame: Ratio names as rows, periods as chronologically ordered columns
+    """
+    if frame.empty:
+        return pd.DataFrame()
+    ratios = compute_panel_ratios(to_panel({"document": frame}))
+    if ratios.empty:
+        return pd.DataFrame()
+    table = ratios.loc["document"].unstack("period")
+    order = [name for name in RATIO_LABELS if name in table.index]
+    periods = sorted(table.columns, key=period_sort_key)
+    return table.loc[order, periods].dropna(how="all")
+
+
+def format_ratio(name: str, value: float) -> str:
+    if pd.isna(value):
+        return "n/a"
+    if name in PERCENT_RATIOS:
+        return f"{value * 100:.1f}%"
+    return f"{value:.2f}x"
+
+
+def latest_values(ratios: pd.DataFrame) -> pd.Series:
+    """Most recent non-missing value of each ratio"""
+    if ratios.empty:
+        return pd.Series(dtype=float)
+    return ratios.ffill(axis=1).iloc[:, -1]
+
+
+def summarize_ratios(ratios: pd.DataFrame) -> list:
+    """Human-readable lines for the latest value of each ratio, with the period it refers to"""
+    lines = []
+    for name, row in ratios.iterrows():
+        observed = row.dropna()
+        if observed.empty:
+            continue
+        lines.append(f"{RATIO_LABELS.get(name, name)} ({observed.index[-1]}): {format_ratio(name, observed.iloc[-1])}")
+    return lines
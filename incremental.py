@@ -0,0 +1,216 @@
+## Incremental re-analysis: only the sections whose pages changed go back to the crew
+import os
+import time
+import hashlib
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import metrics
+from database import (
+    SessionLocal, get_page_texts, save_document_pages, get_section_analyses, save_section_analysis
+)
+from document_cache import document_cache
+from extraction import extract_pages_incremental
+from result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+SECTION_MAX_CHARS = int(os.getenv('INCREMENTAL_SECTION_MAX_CHARS', '24000'))
+SECTION_WORKERS = int(os.getenv('INCREMENTAL_SECTION_WORKERS', '4'))
+
+SECTION_TITLES = {
+    "general": "Overview",
+    "income_statement": "Income Statement",
+    "balance_sheet": "Balance Sheet",
+    "cash_flow": "Cash Flow Statement",
+    "mdna": "Management's Discussion and Analysis",
+    "risk_factors": "Risk Factors",
+    "notes": "Notes to the Financial Statements",
+}
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+
+
+def group_sections(pages: list) -> dict:
+    """Pages with text grouped by section, sections in order of first appearance"""
+    sections = {}
+    for page in pages:
+        if page.text:
+            sections.setdefault(page.section, []).append(page)
+    return sections
+
+
+def split_sections(sections: dict, max_chars: int = SECTION_MAX_CHARS) -> dict:
+    """Sections cut into runs of consecutive pages whose text fits in max_chars
+
+    Returns {key: (section, pages)} in document order. The first run of a
+    section is keyed by the section itself and later runs 'section:2',
+    'section:3', ... so a section that grows past the budget keeps its
+    stored analysis for the pages it already had. Pages are never split;
+    a single page longer than max_chars forms a run of its own.
+    """
+    parts = {}
+    for section, pages in sections.items():
+        runs, size = [[]], 0
+        for page in pages:
+            if runs[-1] and size + len(page.text) > max_chars:
+                runs.append([])
+                size = 0
+            runs[-1].append(page)
+            size += len(page.text) + 1
+        for index, run in enumerate(runs, start=1):
+            parts[section if index == 1 else f"{section}:{index}"] = (section, run)
+    return parts
+
+
+def section_hash(section: str, pages: list) -> str:
+    """Hash of a section's page contents; page numbers are left out so inserted pages elsewhere don't matter"""
+    sha = hashlib.sha256(section.encode('utf-8'))
+    for page in pages:
+        sha.update(page.content_hash.encode('ascii'))
+    return sha.hexdigest()
+
+
+def page_span(pages: list) -> str:
+    """Compact page list such as 'pages 3-5, 9'"""
+    ranges = []
+    for page in pages:
+        if ranges and page.number == ranges[-1][1] + 1:
+            ranges[-1][1] = page.number
+        else:
+            ranges.append([page.number, page.number])
+    parts = [str(start) if start == stop else f"{start}-{stop}" for start, stop in ranges]
+    return ("page " if len(pages) == 1 else "pages ") + ", ".join(parts)
+
+
+def section_title(section: str) -> str:
+    return SECTION_TITLES.get(section, section.replace('_', ' ').title())
+
+
+class IncrementalAnalyzer:
+    """Analyze a filing section by section, reusing stored work for unchanged sections
+
+    Page text is stored per page fingerprint and each section's analysis per
+    (section, content hash, query), so an amended filing that differs from
+    the original in a few pages only re-extracts those pages and only
+    re-analyzes the sections they fall in. Sections longer than
+    SECTION_MAX_CHARS are analyzed in page runs, each stored on its own. The final report stitches fresh
+    and stored section analyses back together in document order.
+
+    Storage is best effort: if the database is unavailable everything is
+    extracted and analyzed from scratch rather than failing the request.
+    """
+
+    def __init__(self, pool, session_factory=SessionLocal, workers: int = SECTION_WORKERS,
+                 max_chars: int = SECTION_MAX_CHARS):
+        self.pool = pool
+        self.session_factory = session_factory
+        self.workers = max(1, workers)
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self.pages_reused = 0
+        self.pages_extracted = 0
+        self.sections_reused = 0
+        self.sections_analyzed = 0
+
+    def _with_db(self, action: str, operation, default=None):
+        db = self.session_factory()
+        try:
+            return operation(db)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Could not %s: %s", action, e)
+            return default
+        finally:
+            db.close()
+
+    def load_pages(self, file_path: str, document_digest: str) -> list:
+        """Pages of the document, extracting only pages not stored from an earlier upload"""
+        report = {}
+        pages = extract_pages_incremental(
+            file_path,
+            lambda fingerprints: self._with_db(
+                "load stored pages", lambda db: get_page_texts(db, fingerprints), {}
+            ),
+            report
+        )
+        self._with_db("store document pages", lambda db: save_document_pages(db, document_digest, pages))
+        with self._lock:
+            self.pages_reused += report['reused']
+            self.pages_extracted += report['extracted']
+        return pages
+
+    def _analyze_section(self, query: str, part: str, section: str, pages: list, key: str,
+                         document_digest: str) -> str:
+        """Run the section crew on one part and store its analysis straight away, so a failed run keeps finished parts"""
+        text = "\n".join(page.text for page in pages)
+        started = time.perf_counter()
+        with metrics.stage('section_analysis', section=section):
+            analysis = str(self.pool.kickoff({
+                'query': query,
+                'section': f"{section_title(section)} ({page_span(pages)})",
+                'section_text': text
+            }))
+        elapsed = time.perf_counter() - started
+        self._with_db("store section analysis", lambda db: save_section_analysis(
+            db, part, section_hash(part, pages), key, analysis, document_digest, elapsed
+        ))
+        return analysis
+
+    def run(self, query: str, file_path: str, document_digest: str = None) -> str:
+        """Report for query over the document, re-running the crew only for changed sections"""
+        document_digest = document_digest or document_cache.digest(file_path)
+        parts = split_sections(group_sections(self.load_pages(file_path, document_digest)), self.max_chars)
+        hashes = {part: section_hash(part, pages) for part, (_, pages) in parts.items()}
+        key = query_hash(query)
+
+        analyses = self._with_db(
+            "load stored section analyses", lambda db: get_section_analyses(db, key, hashes), {}
+        )
+        changed = [part for part in parts if part not in analyses]
+        logger.info("Incremental analysis: %d of %d section parts changed", len(changed), len(parts))
+        metrics.count('section_reused', len(parts) - len(changed))
+        metrics.count('section_analyzed', len(changed))
+
+        if changed:
+            # Copy the caller's context into each thread so LLM calls stay attributed to its user
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(changed))) as executor:
+                futures = {
+                    part: executor.submit(
+                        contextvars.copy_context().run, self._analyze_section,
+                        query, part, *parts[part], key, document_digest
+                    )
+                    for part in changed
+                }
+                for part, future in futures.items():
+                    analyses[part] = future.result()
+
+        with self._lock:
+            self.sections_reused += len(parts) - len(changed)
+            self.sections_analyzed += len(changed)
+        return merge_report(query, parts, analyses)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'pages_reused': self.pages_reused,
+                'pages_extracted': self.pages_extracted,
+                'sections_reused': self.sections_reused,
+                'sections_analyzed': self.sections_analyzed,
+            }
+
+
+def merge_report(query: str, parts: dict, analyses: dict) -> str:
+    """One report with a heading per section part, in document order"""
+    blocks = [f"# Financial analysis: {query}"]
+    for part, (section, pages) in parts.items():
+        blocks.append(f"## {section_title(section)} ({page_span(pages)})\n\n{analyses[part].strip()}")
+    return "\n\n".join(blocks)
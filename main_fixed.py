@@ -1,55 +1,234 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse, PlainTextResponse
 import os
+import json
+import time
 import uuid
 import asyncio
-from crewai import Crew, Process
-from agents import financial_analyst
-from task import analyze_financial_document
+import logging
+from typing import List, Optional
+from search_cache import search_cache
+from crew_executor import CrewExecutor, ExecutorSaturated
+from crew_pool import CrewPool
+from incremental import IncrementalAnalyzer
+from result_cache import create_result_cache
+from document_cache import document_cache
+from extraction import read_document_text
+from comparison import compare_documents, MAX_COMPARE_DOCUMENTS
+from database import AnalysisHistoryPage, AnalysisResultResponse, User
+import database_async
+from uploads import save_upload, UploadTooLarge, UploadSizeLimit
+from celery_worker import analyze_document_async, result_store
+from rate_limiter import llm_user_context, RateLimitTimeout
+import metrics
+from sqlalchemy import select
+from PyPDF2.errors import PdfReadError
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Financial Document Analyzer")
+# Oversized uploads are refused on the request stream, before Starlette spools the body
+app.add_middleware(UploadSizeLimit, files={'/analyze': 1, '/jobs': 1, '/compare': MAX_COMPARE_DOCUMENTS})
+
+# Crew runs are blocking; keep them on a bounded thread pool, not the event loop
+crew_executor = CrewExecutor()
+
+# single: one analyst task; pipeline: verification, investment and risk branches in parallel, then synthesis;
+# incremental: one analyst task per document section, reusing stored analyses of unchanged sections
+CREW_MODE = os.getenv('CREW_MODE', 'single')
 
-def run_crew(query: str, file_path: str="data/sample.pdf"):
-    """To run the whole crew"""
-    financial_crew = Crew(
-        agents=[financial_analyst],
-        tasks=[analyze_financial_document],
-        process=Process.sequential,
-        verbose=True
+# Agents and tasks (and with them crewai, crewai_tools and the LLM client) are only
+# imported when the first crew is built, or up front by warmup()
+def single_crew_members():
+    from agents import financial_analyst
+    from task import analyze_financial_document
+    return [financial_analyst], [analyze_financial_document]
+
+def pipeline_crew_members():
+    from agents import financial_analyst, verifier, investment_advisor, risk_assessor
+    from task import verification_task, investment_analysis, risk_assessment, synthesis_task
+    return (
+        [verifier, investment_advisor, risk_assessor, financial_analyst],
+        [verification_task, investment_analysis, risk_assessment, synthesis_task]
     )
-    
-    result = financial_crew.kickoff({'query': query, 'file_path': file_path})
-    return result
+
+def section_crew_members():
+    from agents import financial_analyst
+    from task import section_analysis
+    return [financial_analyst], [section_analysis]
+
+# Crews are built once per worker and reused; each request gets its own isolated copy
+crew_pool = CrewPool(loader=single_crew_members, name='single')
+pipeline_pool = CrewPool(loader=pipeline_crew_members, name='pipeline')
+section_pool = CrewPool(loader=section_crew_members, name='section')
+
+# Amended filings only re-extract changed pages and re-analyze the sections they fall in
+incremental_analyzer = IncrementalAnalyzer(section_pool)
+
+# Cache hit ratios and queue depth are sampled when /metrics is scraped
+metrics.register_collector('crew_executor', crew_executor.stats)
+metrics.register_collector('crew_pool', crew_pool.stats)
+metrics.register_collector('pipeline_pool', pipeline_pool.stats)
+metrics.register_collector('section_pool', section_pool.stats)
+metrics.register_collector('incremental', incremental_analyzer.stats)
+metrics.register_collector('document_cache', document_cache.stats)
+metrics.register_collector('search_cache', search_cache.stats)
+
+
+# Usage rows are buffered and bulk-inserted in the background when a database is configured
+USAGE_LOGGING = os.getenv('USAGE_LOGGING', 'false').lower() == 'true'
+if USAGE_LOGGING:
+    from usage_logger import usage_log_writer
+
+# Repeated questions about the same filing are answered from cache
+result_cache = create_result_cache()
+metrics.register_collector('result_cache', result_cache.stats)
+
+# Preload when the server imports the app before forking workers (e.g. gunicorn --preload)
+WARMUP_ON_IMPORT = os.getenv('WARMUP_ON_IMPORT', 'false').lower() == 'true'
+
+def warmup():
+    """Import the crew stack and build agents and tasks ahead of the first request
+
+    Run in a parent process before it forks workers, the loaded modules and
+    agent definitions are shared copy-on-write by every child. Pooled crews,
+    thread pools and connections are still created per process.
+    """
+    started = time.perf_counter()
+    crew_pool.load()
+    pipeline_pool.load()
+    section_pool.load()
+    logger.info("Warmed up crew stack in %.2fs", time.perf_counter() - started)
+
+def checkpoint_stages() -> list:
+    """Every stage a queued job can checkpoint, so a finished job can drop them all"""
+    return ['document_metrics'] + crew_pool.stages + pipeline_pool.stages
+
+def run_crew(query: str, file_path: str="data/sample.pdf", mode: str=None,
+             user_id: int=None, tier: str="free", checkpoints=None):
+    """To run the whole crew (LLM calls are scheduled on behalf of user_id at its tier)
+
+    With a job's checkpoints, stages finished by an earlier attempt are not run again.
+    Incremental runs need no checkpoints: each section's analysis is stored as it finishes.
+    """
+    mode = mode or CREW_MODE
+    with llm_user_context(user_id, tier):
+        if mode == 'pipeline':
+            return run_pipeline(query=query, file_path=file_path, checkpoints=checkpoints)
+        if mode == 'incremental':
+            return incremental_analyzer.run(query=query, file_path=file_path)
+        # The agents' tools turn extraction errors into text for the LLM, so an unreadable
+        # PDF has to fail here (pipeline and incremental runs extract before the crew starts)
+        read_document_text(file_path)
+        result = crew_pool.kickoff({'query': query, 'file_path': file_path}, checkpoints)
+        return result
+
+def run_pipeline(query: str, file_path: str="data/sample.pdf", checkpoints=None):
+    """Run the verification, investment and risk branches concurrently, then synthesize
+
+    The document is extracted and its figures computed once up front; the
+    branches share that context (and the cached pages behind the retrieval
+    tools), so end-to-end latency tracks the slowest branch plus synthesis.
+    """
+    from tools import FinancialDocumentTool
+
+    document_metrics = checkpoints.get('document_metrics') if checkpoints is not None else None
+    if document_metrics is None:
+        document_metrics = FinancialDocumentTool.document_brief(file_path)
+        if checkpoints is not None:
+            checkpoints.save('document_metrics', document_metrics)
+    return pipeline_pool.kickoff({
+        'query': query,
+        'file_path': file_path,
+        'document_metrics': document_metrics
+    }, checkpoints)
+
+def run_crew_cached(query: str, file_path: str="data/sample.pdf", file_digest: str=None,
+                    user_id: int=None, tier: str="free", checkpoints=None):
+    """Run the crew unless this document and query already have a cached analysis"""
+    file_digest = file_digest or document_cache.digest(file_path)
+    cached = result_cache.get(file_digest, cache_query(query))
+    if cached is not None:
+        return cached
+    analysis = str(run_crew(
+        query=query, file_path=file_path, user_id=user_id, tier=tier, checkpoints=checkpoints
+    ))
+    result_cache.set(file_digest, cache_query(query), analysis)
+    return analysis
+
+async def subscription_tier(user_id: Optional[int]) -> str:
+    """Subscription tier used to weight this user's share of LLM capacity"""
+    if user_id is None:
+        return "free"
+    try:
+        async with database_async.AsyncSessionLocal() as db:
+            tier = await db.scalar(select(User.subscription_tier).where(User.id == user_id))
+    except Exception:
+        # Rate limiting must not fail a request because the user database is unavailable
+        return "free"
+    return tier or "free"
+
+def cache_query(query: str) -> str:
+    """Result-cache query text; pipeline reports are cached apart from single-task ones"""
+    return query if CREW_MODE == 'single' else f"{CREW_MODE} {query}"
 
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {"message": "Financial Document Analyzer API is running"}
+    return {
+        "message": "Financial Document Analyzer API is running",
+        "analysis_queue": crew_executor.stats(),
+        "crew_pool": crew_pool.stats(),
+        "pipeline_pool": pipeline_pool.stats(),
+        "result_cache": result_cache.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Stage latency histograms, per-agent LLM tokens and cache statistics in Prometheus format"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set METRICS_ENABLED=true")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/analyze")
 async def analyze_document_endpoint(
     file: UploadFile = File(...),
-    query: str = Form(default="Analyze this financial document for investment insights")
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    user_id: Optional[int] = Form(default=None)
 ):
     """Analyze financial document and provide comprehensive investment recommendations"""
     file_id = str(uuid.uuid4())
     file_path = f"data/financial_document_{file_id}.pdf"
+    started = time.perf_counter()
+    status_code = 500
+    file_size = None
     
     try:
         # Ensure data directory exists
         os.makedirs("data", exist_ok=True)
         
-        # Save uploaded file
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # Stream uploaded file to disk, hashing it as it arrives
+        with metrics.stage('upload_write'):
+            file_size, file_digest = await save_upload(file, file_path)
         
         # Validate query
         if query == "" or query is None:
             query = "Analyze this financial document for investment insights"
         
-        # Process the financial document with all analysts
-        response = run_crew(query=query.strip(), file_path=file_path)
+        # Serve repeated questions from cache without taking an executor slot; the lookup
+        # may be a Redis round trip or an embeddings call, so it runs off the event loop
+        with metrics.stage('result_cache_lookup'):
+            response = await asyncio.to_thread(result_cache.get, file_digest, cache_query(query.strip()))
+        if response is None:
+            # Process the financial document with all analysts
+            tier = await subscription_tier(user_id)
+            with metrics.stage('crew_run', mode=CREW_MODE):
+                response = str(await crew_executor.run(
+                    run_crew, query=query.strip(), file_path=file_path, user_id=user_id, tier=tier
+                ))
+            await asyncio.to_thread(result_cache.set, file_digest, cache_query(query.strip()), response)
         
+        status_code = 200
         return {
             "status": "success",
             "query": query,
@@ -57,10 +236,49 @@ async def analyze_document_endpoint(
             "file_processed": file.filename
         }
         
+    except UploadTooLarge as e:
+        status_code = 413
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except ExecutorSaturated as e:
+        status_code = 503
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    except RateLimitTimeout as e:
+        status_code = 503
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "60"})
+
+    except PdfReadError as e:
+        status_code = 422
+        raise HTTPException(status_code=422, detail=f"Unreadable PDF: {str(e)}")
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing financial document: {str(e)}")
     
     finally:
+        metrics.observe('analyze_request', time.perf_counter() - started)
+        if USAGE_LOGGING:
+            usage_log_writer.log_api_usage(
+                user_id=user_id,
+                endpoint="/analyze",
+                processing_time=time.perf_counter() - started,
+                status_code=status_code,
+                file_size=file_size
+            )
+            if file_size is not None:
+                usage_log_writer.log_document_upload(
+                    user_id=user_id,
+                    task_id=file_id,
+                    filename=file.filename,
+                    file_path=file_path,
+                    file_size=file_size,
+                    content_type=file.content_type or "application/pdf"
+                )
+
         # Clean up uploaded file
         if os.path.exists(file_path):
             try:
@@ -68,6 +286,230 @@ async def analyze_document_endpoint(
             except:
                 pass  # Ignore cleanup errors
 
+@app.post("/compare")
+async def compare_documents_endpoint(
+    files: List[UploadFile] = File(...),
+    query: str = Form(default="Compare these companies' profitability, growth and financial health")
+):
+    """Compare several financial documents side by side with one summarizing LLM call"""
+    if len(files) < 2:
+        raise HTTPException(status_code=400, detail="Upload at least two documents to compare")
+    if len(files) > MAX_COMPARE_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_COMPARE_DOCUMENTS} documents per comparison")
+
+    os.makedirs("data", exist_ok=True)
+    documents = {}
+    try:
+        for index, file in enumerate(files):
+            file_path = f"data/financial_document_{uuid.uuid4()}.pdf"
+            name = file.filename or f"document_{index + 1}"
+            if name in documents:
+                name = f"{name} ({index + 1})"
+            documents[name] = file_path
+            await save_upload(file, file_path)
+
+        if query == "" or query is None:
+            query = "Compare these companies' profitability, growth and financial health"
+
+        result = await crew_executor.run(compare_documents, documents, query.strip())
+        if result["comparison"] is None:
+            raise HTTPException(status_code=422, detail="No financial statement tables could be parsed from the documents")
+
+        return {
+            "status": "success",
+            "query": query,
+            "documents": list(documents),
+            **result
+        }
+
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    except ExecutorSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing financial documents: {str(e)}")
+
+    finally:
+        for file_path in documents.values():
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+## Asynchronous job API backed by the Celery worker
+JOB_EVENT_POLL_SECONDS = float(os.getenv('JOB_EVENT_POLL_SECONDS', '1.0'))
+JOB_TERMINAL_STATES = {"SUCCESS", "FAILURE", "REVOKED"}
+
+RESULTS_MAX_IDS = int(os.getenv('RESULTS_MAX_IDS', '500'))
+
+def _job_status_from_store(job_id: str, status: dict, result: dict) -> dict:
+    """Shape a result-store record the same way for single and batched reads"""
+    job = {
+        "job_id": job_id,
+        "state": status['state'],
+        "progress": status.get('progress', 0),
+        "message": status.get('message'),
+    }
+    if result is not None:
+        if result.get('status') == 'success':
+            job["result"] = result
+        else:
+            job["error"] = result.get('error')
+    return job
+
+def get_job_status(job_id: str) -> Optional[dict]:
+    """Job status from the result store, or None for unknown and expired job ids
+
+    Every submitted job gets a record before it is queued, so a missing
+    record means the id is wrong or the record expired. Celery's backend is
+    not consulted: it reports PENDING for any id.
+    """
+    record = result_store.get_many([job_id])[job_id]
+    if record['status'] is None:
+        return None
+    return _job_status_from_store(job_id, record['status'], record['result'])
+
+@app.post("/jobs", status_code=202)
+async def submit_job_endpoint(
+    file: UploadFile = File(...),
+    query: str = Form(default="Analyze this financial document for investment insights"),
+    user_id: Optional[int] = Form(default=None)
+):
+    """Queue a financial document for analysis by the Celery worker and return its job id"""
+    job_id = str(uuid.uuid4())
+    file_path = f"data/financial_document_{job_id}.pdf"
+    os.makedirs("data", exist_ok=True)
+
+    try:
+        await save_upload(file, file_path)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    if query == "" or query is None:
+        query = "Analyze this financial document for investment insights"
+
+    try:
+        await asyncio.to_thread(result_store.set_status, job_id, "PENDING", 0, "Queued")
+        tier = await subscription_tier(user_id)
+        await asyncio.to_thread(
+            analyze_document_async.apply_async,
+            args=[file_path, query.strip(), job_id],
+            kwargs={'user_id': user_id, 'tier': tier},
+            task_id=job_id
+        )
+    except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=503, detail=f"Could not queue analysis job: {str(e)}")
+
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events",
+        "file_processed": file.filename
+    }
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    """Current state, progress and (when finished) result of an analysis job"""
+    status = await asyncio.to_thread(get_job_status, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return status
+
+@app.get("/results")
+async def batch_results_endpoint(ids: str = Query(..., description="Comma-separated job ids")):
+    """Status and results for many jobs in one round trip to the result store"""
+    job_ids = list(dict.fromkeys(job_id.strip() for job_id in ids.split(",") if job_id.strip()))
+    if len(job_ids) > RESULTS_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {RESULTS_MAX_IDS} ids per request")
+
+    records = await asyncio.to_thread(result_store.get_many, job_ids)
+    return {
+        "results": {
+            job_id: (
+                _job_status_from_store(job_id, record['status'], record['result'])
+                if record['status'] is not None else None
+            )
+            for job_id, record in records.items()
+        }
+    }
+
+@app.get("/jobs/{job_id}/events")
+async def job_events_endpoint(job_id: str):
+    """Server-sent events stream of job progress, closed once the job finishes"""
+    first = await asyncio.to_thread(get_job_status, job_id)
+    if first is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+
+    async def event_stream():
+        last = None
+        status = first
+        while True:
+            if status is None:
+                # The record expired while the client was listening
+                yield f"event: expired\ndata: {json.dumps({'job_id': job_id})}\n\n"
+                break
+            if status != last:
+                yield f"event: progress\ndata: {json.dumps(status, default=str)}\n\n"
+                last = status
+            if status["state"] in JOB_TERMINAL_STATES:
+                break
+            await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
+            status = await asyncio.to_thread(get_job_status, job_id)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+## Analysis history
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '100'))
+
+@app.get("/users/{user_id}/history", response_model=AnalysisHistoryPage)
+async def analysis_history_endpoint(
+    user_id: int,
+    limit: int = Query(default=20, ge=1),
+    cursor: str = Query(default=None),
+    db=Depends(database_async.get_db)
+):
+    """Page through a user's past analyses, newest first; pass next_cursor back to get the following page"""
+    try:
+        rows, next_cursor = await database_async.get_user_analysis_history_page(
+            db, user_id, min(limit, HISTORY_MAX_PAGE_SIZE), cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AnalysisHistoryPage(
+        items=[AnalysisResultResponse.from_orm(row) for row in rows],
+        next_cursor=next_cursor
+    )
+
+@app.on_event("startup")
+def start_usage_logging():
+    """Start the background usage-log flusher"""
+    if USAGE_LOGGING:
+        usage_log_writer.start()
+
+@app.on_event("shutdown")
+def shutdown_background_work():
+    """Stop accepting queued analyses and flush buffered writes on shutdown"""
+    crew_executor.shutdown()
+    if USAGE_LOGGING:
+        # Flush buffered usage rows before the process exits
+        usage_log_writer.close()
+
+if WARMUP_ON_IMPORT:
+    warmup()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,229 @@
+## Per-stage latency histograms, LLM token counters and Prometheus exposition
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+METRICS_WORKER_PORT = int(os.getenv('METRICS_WORKER_PORT', '0'))
+
+# Seconds; spans sub-millisecond cache lookups up to multi-minute crew runs
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label value"""
+
+    def __init__(self, name: str, help_text: str, label: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_value, (counts, total, count) in sorted(series.items()):
+            labels = f'{self.label}="{label_value}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter over a fixed set of label names"""
+
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            labels = ",".join(f'{name}="{value_}"' for name, value_ in zip(self.labels, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+stage_seconds = Histogram('analyzer_stage_seconds', 'Time spent in each processing stage', 'stage')
+llm_tokens = Counter('analyzer_llm_tokens_total', 'LLM tokens used per agent', ('agent', 'kind'))
+events = Counter('analyzer_events_total', 'Counted events such as job retries and failures', ('event',))
+
+# name -> callable returning {metric suffix: value}, sampled at scrape time
+_collectors = {}
+
+_tracer = None
+
+
+def _setup_tracing():
+    """OpenTelemetry tracer; exports over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set"""
+    from opentelemetry import trace
+    if os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT'):
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider = TracerProvider(resource=Resource.create({
+            'service.name': os.getenv('OTEL_SERVICE_NAME', 'financial-analyzer')
+        }))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+    return trace.get_tracer('financial_analyzer')
+
+
+@contextmanager
+def _timed_stage(name: str, attributes: dict = None):
+    started = time.perf_counter()
+    with _tracer.start_as_current_span(name, attributes=attributes):
+        try:
+            yield
+        finally:
+            stage_seconds.observe(name, time.perf_counter() - started)
+
+
+def stage(name: str, **attributes):
+    """Time a block into the stage histogram and an OpenTelemetry span
+
+    When metrics are disabled this returns a shared no-op context manager.
+    """
+    if not METRICS_ENABLED:
+        return nullcontext()
+    return _timed_stage(name, attributes or None)
+
+
+def observe(name: str, seconds: float):
+    """Record a duration measured by the caller"""
+    if METRICS_ENABLED:
+        stage_seconds.observe(name, seconds)
+
+
+def count(event: str, amount: float = 1):
+    if METRICS_ENABLED:
+        events.inc((event,), amount)
+
+
+def record_agent_tokens(agent: str, prompt_tokens: int, completion_tokens: int):
+    if METRICS_ENABLED:
+        llm_tokens.inc((agent, 'prompt'), prompt_tokens)
+        llm_tokens.inc((agent, 'completion'), completion_tokens)
+
+
+def register_collector(name: str, collect):
+    """Expose collect()'s numeric values as analyzer_{name}_{key} gauges"""
+    _collectors[name] = collect
+
+
+def _gauge_lines() -> list:
+    lines = []
+    for name, collect in sorted(_collectors.items()):
+        try:
+            values = collect()
+        except Exception as e:
+            logger.warning("Metrics collector %s failed: %s", name, e)
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"analyzer_{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+    return lines
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = stage_seconds.render() + llm_tokens.render() + events.render() + _gauge_lines()
+    return "\n".join(lines) + "\n"
+
+
+_litellm_logger = None
+_litellm_logger_lock = threading.Lock()
+
+
+def install_llm_logger():
+    """Time every LLM call the agents make through litellm
+
+    Called when the first crew is built, so importing this module with
+    metrics enabled does not import litellm. Installs the logger once.
+    """
+    global _litellm_logger
+    with _litellm_logger_lock:
+        if _litellm_logger is None:
+            _litellm_logger = _litellm_metrics_logger()
+
+
+def _litellm_metrics_logger():
+    import litellm
+    from litellm.integrations.custom_logger import CustomLogger
+
+    class LiteLLMMetricsLogger(CustomLogger):
+        def log_success_event(self, kwargs, response_obj, start_time, end_time):
+            stage_seconds.observe('llm_call', (end_time - start_time).total_seconds())
+
+        def log_failure_event(self, kwargs, response_obj, start_time, end_time):
+            events.inc(('llm_call_failed',))
+
+    litellm_logger = LiteLLMMetricsLogger()
+    litellm.success_callback.append(litellm_logger)
+    litellm.failure_callback.append(litellm_logger)
+    return litellm_logger
+
+
+def start_metrics_server(port: int):
+    """Serve /metrics from a background thread (for processes without the FastAPI app)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info("Serving metrics on port %d", port)
+    return server
+
+
+if METRICS_ENABLED:
+    _tracer = _setup_tracing()
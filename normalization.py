@@ -0,0 +1,32 @@
+## Shared whitespace normalization for the tool text pipeline
+import re
+
+# One pass over the text: any whitespace run containing a line break becomes a
+# single newline, any other run of horizontal whitespace becomes a single space.
+_WHITESPACE_RUN = re.compile(r"[^\S\n]*\n\s*|[^\S\n]+")
+
+
+def _collapse(match) -> str:
+    return "\n" if "\n" in match.group() else " "
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse whitespace runs and blank lines in a single linear pass
+
+    Args:
+        text (str): Raw text, e.g. one extracted PDF page.
+
+    Returns:
+        str: Text with no blank lines, no repeated spaces and no surrounding whitespace
+    """
+    if not text:
+        return ""
+    return _WHITESPACE_RUN.sub(_collapse, text).strip()
+
+
+def normalize_chunks(chunks):
+    """Normalize an iterable of text chunks (e.g. pages) lazily, skipping empty ones"""
+    for chunk in chunks:
+        normalized = normalize_whitespace(chunk)
+        if normalized:
+            yield normalized
@@ -0,0 +1,371 @@
+## Cluster-wide LLM rate limiting with fair per-user scheduling
+import os
+import copy
+import time
+import uuid
+import heapq
+import logging
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '60'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', '40000'))
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv('LLM_RATE_LIMIT_MAX_WAIT', '300'))
+LLM_COMPLETION_TOKENS_ESTIMATE = int(os.getenv('LLM_COMPLETION_TOKENS_ESTIMATE', '500'))
+LLM_RATE_LIMIT_KEY = os.getenv('LLM_RATE_LIMIT_KEY', 'llm_rate_limit')
+
+# Share of LLM capacity per subscription tier when users compete for it
+TIER_WEIGHTS = {'free': 1.0, 'premium': 2.0, 'enterprise': 4.0}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when an LLM call waited longer than LLM_RATE_LIMIT_MAX_WAIT for capacity"""
+
+
+## Token buckets
+# Checks the request bucket and the token bucket together and only debits
+# both when both have room; otherwise returns how long to wait. With
+# ARGV[7] == 1 the cost is debited unconditionally (usage reconciliation).
+_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local req_capacity, req_rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local tok_capacity, tok_rate = tonumber(ARGV[3]), tonumber(ARGV[4])
+local requests, tokens, force = tonumber(ARGV[5]), tonumber(ARGV[6]), tonumber(ARGV[7])
+
+local function level(key, capacity, rate)
+  local data = redis.call('HMGET', key, 'level', 'ts')
+  local value = tonumber(data[1]) or capacity
+  local ts = tonumber(data[2]) or now
+  return math.min(capacity, value + (now - ts) * rate)
+end
+
+local req_level = level(KEYS[1], req_capacity, req_rate)
+local tok_level = level(KEYS[2], tok_capacity, tok_rate)
+if force == 0 then
+  local wait = 0
+  if req_level < requests then wait = math.max(wait, (requests - req_level) / req_rate) end
+  if tok_level < tokens then wait = math.max(wait, (tokens - tok_level) / tok_rate) end
+  if wait > 0 then return tostring(wait) end
+end
+redis.call('HSET', KEYS[1], 'level', req_level - requests, 'ts', now)
+redis.call('HSET', KEYS[2], 'level', tok_level - tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 300)
+redis.call('EXPIRE', KEYS[2], 300)
+return '0'
+"""
+
+
+class LocalTokenBuckets:
+    """In-process request and token buckets, used when Redis is unavailable"""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.capacities = (float(requests_per_minute), float(tokens_per_minute))
+        self.rates = (requests_per_minute / 60.0, tokens_per_minute / 60.0)
+        self._levels = list(self.capacities)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, requests: float, tokens: float, force: bool = False) -> float:
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            self._levels = [
+                min(capacity, level + elapsed * rate)
+                for level, capacity, rate in zip(self._levels, self.capacities, self.rates)
+            ]
+            if not force:
+                wait = max(
+                    (cost - level) / rate if level < cost else 0.0
+                    for cost, level, rate in zip((requests, tokens), self._levels, self.rates)
+                )
+                if wait > 0:
+                    return wait
+            self._levels = [level - cost for level, cost in zip(self._levels, (requests, tokens))]
+            return 0.0
+
+
+class TokenBucketLimiter:
+    """Requests-per-minute and tokens-per-minute buckets shared through Redis
+
+    Every process pointing at the same Redis draws from the same buckets.
+    If Redis cannot be reached the limiter degrades to per-process buckets
+    rather than blocking LLM calls outright.
+    """
+
+    def __init__(self, client=None, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE, key: str = LLM_RATE_LIMIT_KEY):
+        self.client = client
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.keys = [f'{key}:requests', f'{key}:tokens']
+        self.local = LocalTokenBuckets(requests_per_minute, tokens_per_minute)
+        self._script = None
+        if client is not None and hasattr(client, 'register_script'):
+            self._script = client.register_script(_BUCKET_SCRIPT)
+
+    def _take(self, requests: float, tokens: float, force: bool) -> float:
+        # A single call larger than the bucket could never be admitted; cap it
+        tokens = min(tokens, self.tokens_per_minute)
+        if self._script is not None:
+            try:
+                wait = self._script(keys=self.keys, args=[
+                    self.requests_per_minute, self.requests_per_minute / 60.0,
+                    self.tokens_per_minute, self.tokens_per_minute / 60.0,
+                    requests, tokens, 1 if force else 0,
+                ])
+                return float(wait)
+            except Exception as e:
+                logger.warning("Redis rate limiter unavailable, using local buckets: %s", e)
+        return self.local.take(requests, tokens, force)
+
+    def try_acquire(self, tokens: float) -> float:
+        """Debit one request and tokens if both buckets allow it; otherwise seconds to wait"""
+        return self._take(1, tokens, force=False)
+
+    def adjust(self, tokens: float):
+        """Debit (or refund, if negative) the difference between estimated and actual usage"""
+        if tokens:
+            self._take(0, tokens, force=True)
+
+
+## Fair scheduling between users
+class FairScheduler:
+    """Weighted fair queue in front of the shared buckets
+
+    Each caller gets a virtual finish time of ``start + tokens / weight``,
+    where the weight comes from its subscription tier and ``start`` is the
+    later of the user's previous finish time and the scheduler's clock.
+    Callers are admitted in finish-time order, so a user firing many calls
+    cannot starve others and higher tiers get proportionally more capacity
+    without locking lower tiers out.
+
+    The queue and virtual clock are per process: fairness holds between
+    calls waiting in the same process, while the request and token budget
+    they wait for is shared cluster-wide through the buckets.
+    """
+
+    def __init__(self, limiter: TokenBucketLimiter, max_wait: float = LLM_RATE_LIMIT_MAX_WAIT):
+        self.limiter = limiter
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._user_finish = {}
+        self._clock = 0.0
+
+    def _prune(self):
+        """Forget users whose finish time the clock has passed; they start from the clock anyway"""
+        for user in [user for user, finish in self._user_finish.items() if finish <= self._clock]:
+            del self._user_finish[user]
+
+    def acquire(self, user: str, tier: str, tokens: float):
+        """Block until this call may go to the LLM provider"""
+        weight = TIER_WEIGHTS.get(tier, TIER_WEIGHTS['free'])
+        deadline = time.monotonic() + self.max_wait
+        with self._cond:
+            start = max(self._user_finish.get(user, 0.0), self._clock)
+            finish = start + tokens / weight
+            self._user_finish[user] = finish
+            entry = (finish, next(self._sequence))
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # The call never ran, so it must not push the user's later calls back
+                        self._user_finish[user] = self._user_finish.get(user, finish) - tokens / weight
+                        raise RateLimitTimeout(f"LLM capacity not available within {self.max_wait:.0f}s")
+                    if self._queue[0] != entry:
+                        self._cond.wait(remaining)
+                        continue
+                    wait = self.limiter.try_acquire(tokens)
+                    if wait <= 0:
+                        self._clock = max(self._clock, start)
+                        return
+                    self._cond.wait(min(wait, remaining))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._prune()
+                self._cond.notify_all()
+
+
+## Request context: who the current LLM calls are made for
+_current_user = contextvars.ContextVar('llm_user', default=('anonymous', 'free'))
+
+
+def current_llm_user() -> tuple:
+    """(user_id, tier) LLM calls in the current context are attributed to"""
+    return _current_user.get()
+
+
+@contextmanager
+def llm_user_context(user_id=None, tier: str = 'free'):
+    """Attribute LLM calls made inside the block to user_id at the given subscription tier"""
+    token = _current_user.set((str(user_id) if user_id is not None else 'anonymous', tier or 'free'))
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class LLMCallLimiter:
+    """Admits LLM calls through the scheduler and reconciles their real token usage
+
+    Calls are charged an estimate (prompt size plus an allowance for the
+    completion) up front; when the provider reports actual usage the
+    difference is debited or refunded.
+    """
+
+    def __init__(self, scheduler: FairScheduler):
+        self.scheduler = scheduler
+        self._estimates = {}
+        self._lock = threading.Lock()
+
+    def before_call(self, call_id, prompt_text: str, user: tuple = None):
+        """Wait for capacity; user is (user_id, tier), defaulting to the current context's"""
+        estimate = estimate_tokens(prompt_text) + LLM_COMPLETION_TOKENS_ESTIMATE
+        user, tier = user or _current_user.get()
+        self.scheduler.acquire(user, tier, estimate)
+        with self._lock:
+            self._estimates[call_id] = estimate
+
+    def after_call(self, call_id, total_tokens=None):
+        with self._lock:
+            estimate = self._estimates.pop(call_id, None)
+        if estimate is not None and total_tokens is not None:
+            self.scheduler.limiter.adjust(total_tokens - estimate)
+
+
+def _langchain_handler(limiter: LLMCallLimiter):
+    """LangChain handler for direct ``llm.invoke`` calls
+
+    Built on first use so importing this module does not import LangChain.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class RateLimitCallbackHandler(BaseCallbackHandler):
+        raise_error = True
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            limiter.before_call(run_id, "".join(prompts))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            limiter.before_call(run_id, "".join(
+                str(message.content) for batch in messages for message in batch
+            ))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            usage = (response.llm_output or {}).get('token_usage') or {}
+            limiter.after_call(run_id, usage.get('total_tokens'))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            limiter.after_call(run_id)
+
+    return RateLimitCallbackHandler()
+
+
+def _rate_limited_llm_class(limiter: LLMCallLimiter):
+    """crewai LLM whose completions wait for the scheduler before going to the provider
+
+    crewai runs litellm's input callbacks inside a try/except, so a wait
+    enforced from a logging hook could neither fail the request nor stop
+    the call; wrapping ``call`` does both. Built on first use so importing
+    this module does not import crewai.
+    """
+    from crewai import LLM
+
+    class RateLimitedLLM(LLM):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.user = None
+            self.timed_out = False
+
+        def pin(self, user: tuple = None):
+            """Attribute calls to user, (user_id, tier), instead of the calling thread's context
+
+            crewai runs ``async_execution`` tasks in bare threads that do not
+            inherit the request's context, so pooled crews pin their user.
+            """
+            self.user = user
+            self.timed_out = False
+
+        def call(self, messages, *args, **kwargs):
+            if self.timed_out:
+                # crewai retries failed tasks; fail them at once rather than waiting out the timeout again
+                raise RateLimitTimeout("LLM capacity not available for this request")
+            prompt = messages if isinstance(messages, str) else "".join(
+                str(message.get('content') or '') for message in messages
+            )
+            call_id = uuid.uuid4()
+            try:
+                limiter.before_call(call_id, prompt, self.user)
+            except RateLimitTimeout:
+                self.timed_out = self.user is not None
+                raise
+            response = None
+            try:
+                response = super().call(messages, *args, **kwargs)
+                return response
+            finally:
+                # crewai does not hand back the provider's usage; reconcile against the response size
+                limiter.after_call(
+                    call_id, None if response is None else estimate_tokens(prompt) + estimate_tokens(str(response))
+                )
+
+    return RateLimitedLLM
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def get_limiter() -> LLMCallLimiter:
+    """Process-wide limiter backed by the worker's Redis client
+
+    Falls back to local buckets when no Redis client can be created.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            try:
+                from celery_worker import redis_client
+            except Exception as e:
+                logger.warning("No Redis client for LLM rate limiting, using local buckets: %s", e)
+                redis_client = None
+            _limiter = LLMCallLimiter(FairScheduler(TokenBucketLimiter(redis_client)))
+        return _limiter
+
+
+def get_rate_limit_handler():
+    """Process-wide LangChain callback handler for LLMs invoked directly"""
+    global _handler
+    limiter = get_limiter()
+    with _handler_lock:
+        if _handler is None:
+            _handler = _langchain_handler(limiter)
+        return _handler
+
+
+def rate_limited_llm(**kwargs):
+    """crewai LLM (same arguments as ``crewai.LLM``) whose calls go through the process-wide limiter"""
+    return _rate_limited_llm_class(get_limiter())(**kwargs)
+
+
+def copy_llm(llm):
+    """Private copy of a rate-limited LLM that can be pinned to one request; other LLMs are shared"""
+    return copy.copy(llm) if hasattr(llm, 'pin') else llm
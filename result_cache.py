@@ -0,0 +1,191 @@
+## Cache of crew analyses keyed by document content and normalized query
+import os
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+load_dotenv()
+
+RESULT_CACHE_BACKEND = os.getenv('RESULT_CACHE_BACKEND', 'memory')  # memory, redis
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1024'))
+RESULT_CACHE_SEMANTIC = os.getenv('RESULT_CACHE_SEMANTIC', 'false').lower() == 'true'
+RESULT_CACHE_SIMILARITY = float(os.getenv('RESULT_CACHE_SIMILARITY', '0.95'))
+
+_NON_WORD = re.compile(r"[^\w%$.]+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial rewordings share a key"""
+    words = _NON_WORD.sub(" ", (query or "").lower()).split()
+    return " ".join(word.strip(".") for word in words if word.strip("."))
+
+
+def cache_key(document_digest: str, query: str) -> str:
+    query_hash = hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()[:32]
+    return f"{document_digest}:{query_hash}"
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+## Backends
+class MemoryBackend:
+    """In-process LRU dictionary with per-entry expiry"""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Stores entries in Redis with a TTL
+
+    LRU eviction is left to the server (``maxmemory-policy allkeys-lru``),
+    which applies it across every process sharing the cache.
+    """
+
+    def __init__(self, client, prefix: str = 'analysis_cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return raw.decode('utf-8') if isinstance(raw, bytes) else raw
+
+    def set(self, key: str, value: str, ttl: int):
+        self.client.setex(self.prefix + key, ttl, value)
+
+
+class ResultCache:
+    """Front cache for run_crew results
+
+    Exact matches are looked up by (document hash, normalized query). When
+    an ``embedder`` is supplied, a miss falls back to the most similar
+    earlier query against the same document if its cosine similarity
+    reaches ``similarity_threshold``.
+    """
+
+    def __init__(self, backend, ttl: int = RESULT_CACHE_TTL, embedder=None,
+                 similarity_threshold: float = RESULT_CACHE_SIMILARITY, max_queries_per_document: int = 64):
+        self.backend = backend
+        self.ttl = ttl
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.max_queries_per_document = max_queries_per_document
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # document digest -> OrderedDict(cache key -> query embedding)
+        self._embeddings = OrderedDict()
+
+    def _semantic_lookup(self, document_digest: str, query: str):
+        with self._lock:
+            candidates = list(self._embeddings.get(document_digest, {}).items())
+        if not candidates:
+            return None
+        vector = self.embedder(normalize_query(query))
+        best_key, best_score = None, 0.0
+        for key, other in candidates:
+            score = _cosine(vector, other)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_score >= self.similarity_threshold:
+            return self.backend.get(best_key)
+        return None
+
+    def get(self, document_digest: str, query: str):
+        """Cached analysis text for this document and query, or None"""
+        value = self.backend.get(cache_key(document_digest, query))
+        if value is None and self.embedder is not None:
+            value = self._semantic_lookup(document_digest, query)
+            if value is not None:
+                with self._lock:
+                    self.semantic_hits += 1
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, document_digest: str, query: str, analysis: str):
+        key = cache_key(document_digest, query)
+        self.backend.set(key, analysis, self.ttl)
+        if self.embedder is None:
+            return
+        vector = self.embedder(normalize_query(query))
+        with self._lock:
+            queries = self._embeddings.setdefault(document_digest, OrderedDict())
+            queries[key] = vector
+            while len(queries) > self.max_queries_per_document:
+                queries.popitem(last=False)
+            self._embeddings.move_to_end(document_digest)
+            while len(self._embeddings) > RESULT_CACHE_MAX_ENTRIES:
+                self._embeddings.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def create_result_cache() -> ResultCache:
+    """Build the cache configured by RESULT_CACHE_* environment variables"""
+    if RESULT_CACHE_BACKEND == 'redis':
+        from celery_worker import redis_client
+        backend = RedisBackend(redis_client)
+    else:
+        backend = MemoryBackend()
+
+    embedder = None
+    if RESULT_CACHE_SEMANTIC:
+        embedder = _lazy_openai_embedder()
+    return ResultCache(backend, embedder=embedder)
+
+
+def _lazy_openai_embedder():
+    """embed_query of an OpenAIEmbeddings client created on the first lookup, not at import"""
+    client = []
+    lock = threading.Lock()
+
+    def embed(text: str):
+        with lock:
+            if not client:
+                from langchain_openai import OpenAIEmbeddings
+                client.append(OpenAIEmbeddings())
+        return client[0].embed_query(text)
+
+    return embed
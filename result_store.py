@@ -0,0 +1,126 @@
+## Structured analysis result store on Redis
+import os
+import json
+import zlib
+from dotenv import load_dotenv
+load_dotenv()
+
+RESULT_TTL = int(os.getenv('RESULT_TTL', '3600'))
+RESULT_COMPRESS_THRESHOLD = int(os.getenv('RESULT_COMPRESS_THRESHOLD', str(16 * 1024)))
+
+# Compressed payloads are prefixed so readers can tell them from plain JSON
+_COMPRESSED_PREFIX = b'z:'
+
+
+def encode(value: dict, compress_threshold: int = RESULT_COMPRESS_THRESHOLD) -> bytes:
+    """JSON-encode value, zlib-compressing bodies larger than the threshold"""
+    payload = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+    if len(payload) > compress_threshold:
+        return _COMPRESSED_PREFIX + zlib.compress(payload)
+    return payload
+
+
+def decode(raw):
+    """Inverse of encode; returns None for missing keys"""
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    if raw.startswith(_COMPRESSED_PREFIX):
+        raw = zlib.decompress(raw[len(_COMPRESSED_PREFIX):])
+    return json.loads(raw)
+
+
+class ResultStore:
+    """Job status and results kept under analysis_status:{id} / analysis_result:{id}
+
+    Status records are small and rewritten as a job progresses; the result
+    record holds the full analysis. Both are written in a single pipelined
+    round trip, and any number of jobs can be read back with one MGET.
+    """
+
+    STATUS_PREFIX = 'analysis_status:'
+    RESULT_PREFIX = 'analysis_result:'
+
+    def __init__(self, client, ttl: int = RESULT_TTL, compress_threshold: int = RESULT_COMPRESS_THRESHOLD):
+        self.client = client
+        self.ttl = ttl
+        self.compress_threshold = compress_threshold
+
+    def set_status(self, task_id: str, state: str, progress: int = 0, message: str = None):
+        status = {'task_id': task_id, 'state': state, 'progress': progress, 'message': message}
+        self.client.setex(self.STATUS_PREFIX + task_id, self.ttl, encode(status))
+
+    def set_result(self, task_id: str, result: dict, state: str):
+        """Write the final status and the result body in one round trip"""
+        status = {
+            'task_id': task_id,
+            'state': state,
+            'progress': result.get('progress', 100),
+            'message': result.get('error'),
+        }
+        pipe = self.client.pipeline(transaction=False)
+        pipe.setex(self.STATUS_PREFIX + task_id, self.ttl, encode(status))
+        pipe.setex(self.RESULT_PREFIX + task_id, self.ttl, encode(result, self.compress_threshold))
+        pipe.execute()
+
+    def get_status(self, task_id: str):
+        return decode(self.client.get(self.STATUS_PREFIX + task_id))
+
+    def get_result(self, task_id: str):
+        return decode(self.client.get(self.RESULT_PREFIX + task_id))
+
+    def get_many(self, task_ids) -> dict:
+        """Status and result for every id with a single MGET
+
+        Returns:
+            dict: task id -> {'status': dict or None, 'result': dict or None}
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return {}
+        keys = [self.STATUS_PREFIX + task_id for task_id in task_ids]
+        keys += [self.RESULT_PREFIX + task_id for task_id in task_ids]
+        values = self.client.mget(keys)
+        count = len(task_ids)
+        return {
+            task_id: {'status': decode(values[i]), 'result': decode(values[count + i])}
+            for i, task_id in enumerate(task_ids)
+        }
+
+
+class JobCheckpoints:
+    """Outputs of a job's completed stages, kept so a retry can resume after them
+
+    Each stage is its own key (analysis_checkpoint:{id}:{stage}), so
+    branches finishing concurrently never overwrite each other; all
+    stages are read back with one MGET.
+    """
+
+    PREFIX = 'analysis_checkpoint:'
+
+    def __init__(self, store: ResultStore, task_id: str):
+        self.store = store
+        self.task_id = task_id
+
+    def _key(self, stage: str) -> str:
+        return f'{self.PREFIX}{self.task_id}:{stage}'
+
+    def save(self, stage: str, value):
+        self.store.client.setex(self._key(stage), self.store.ttl, encode(value, self.store.compress_threshold))
+
+    def get(self, stage: str):
+        return decode(self.store.client.get(self._key(stage)))
+
+    def load(self, stages) -> dict:
+        """Saved output for each of stages that has completed"""
+        stages = list(stages)
+        if not stages:
+            return {}
+        values = self.store.client.mget([self._key(stage) for stage in stages])
+        return {stage: decode(value) for stage, value in zip(stages, values) if value is not None}
+
+    def clear(self, stages):
+        stages = list(stages)
+        if stages:
+            self.store.client.delete(*[self._key(stage) for stage in stages])
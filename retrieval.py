@@ -0,0 +1,163 @@
+## Section-aware chunking and local BM25 retrieval over extracted documents
+import os
+import re
+import math
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from dotenv import load_dotenv
+load_dotenv()
+
+from document_cache import document_cache
+from extraction import iter_document_pages
+
+CHUNK_WORDS = int(os.getenv('RETRIEVAL_CHUNK_WORDS', '200'))
+CHUNK_OVERLAP_WORDS = int(os.getenv('RETRIEVAL_CHUNK_OVERLAP_WORDS', '40'))
+RETRIEVAL_TOP_K = int(os.getenv('RETRIEVAL_TOP_K', '6'))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv('RETRIEVAL_TOKEN_BUDGET', '3000'))
+INDEX_CACHE_SIZE = int(os.getenv('RETRIEVAL_INDEX_CACHE_SIZE', '32'))
+
+# Query phrases that point at a specific statement or section
+SECTION_HINTS = {
+    "income_statement": ("revenue", "income", "earnings", "margin", "profit", "eps", "operating expense"),
+    "balance_sheet": ("balance sheet", "assets", "liabilities", "equity", "debt", "leverage", "inventory"),
+    "cash_flow": ("cash flow", "free cash", "capex", "capital expenditure", "liquidity"),
+    "mdna": ("outlook", "guidance", "discussion", "trend", "strategy"),
+    "risk_factors": ("risk", "uncertaint", "exposure", "regulat", "litigation"),
+}
+SECTION_BOOST = 1.5
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9$%.,]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def _stem(token: str) -> str:
+    """Fold simple plurals so 'revenues' matches 'revenue'"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and token.isalpha():
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list:
+    """Lowercased word tokens with stop words and trailing punctuation removed"""
+    tokens = (token.rstrip(".,") for token in _TOKEN.findall(text.lower()))
+    return [_stem(token) for token in tokens if token and token not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class Chunk:
+    """A section-labelled slice of one page"""
+    page: int
+    section: str
+    text: str
+
+    def render(self) -> str:
+        return f"[page {self.page} | {self.section}]\n{self.text}"
+
+
+def chunk_pages(pages, chunk_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP_WORDS):
+    """Split pages into overlapping word windows that never cross a page boundary"""
+    step = max(1, chunk_words - overlap)
+    for page in pages:
+        words = page.text.split()
+        for start in range(0, max(len(words), 1), step):
+            window = words[start:start + chunk_words]
+            if window:
+                yield Chunk(page=page.number, section=page.section, text=" ".join(window))
+            if start + chunk_words >= len(words):
+                break
+
+
+class BM25Index:
+    """Okapi BM25 over a document's chunks, built once and kept in memory"""
+
+    def __init__(self, chunks, k1: float = 1.5, b: float = 0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(chunk.text)) for chunk in self.chunks]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freqs = Counter()
+        for freqs in self._term_freqs:
+            doc_freqs.update(freqs.keys())
+        total = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def score(self, query_terms: list, index: int) -> float:
+        freqs = self._term_freqs[index]
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / (self._avg_length or 1))
+        total = 0.0
+        for term in query_terms:
+            tf = freqs.get(term)
+            if tf:
+                total += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return total
+
+    def search(self, query: str, top_k: int = RETRIEVAL_TOP_K, sections=None):
+        """Best-scoring chunks for query, boosting sections the query refers to"""
+        query_terms = tokenize(query)
+        boosted = set(sections or ()) | query_sections(query)
+        scored = []
+        for index, chunk in enumerate(self.chunks):
+            score = self.score(query_terms, index)
+            if score <= 0:
+                continue
+            if chunk.section in boosted:
+                score *= SECTION_BOOST
+            scored.append((score, index))
+        scored.sort(reverse=True)
+        return [(self.chunks[index], score) for score, index in scored[:top_k]]
+
+
+def query_sections(query: str) -> set:
+    """Sections whose hint phrases appear in the query"""
+    lowered = query.lower()
+    return {
+        section for section, hints in SECTION_HINTS.items()
+        if any(hint in lowered for hint in hints)
+    }
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(path: str) -> BM25Index:
+    """BM25 index for the document at path, built once per content hash"""
+    digest = document_cache.digest(path)
+    with _indexes_lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+            return index
+    index = BM25Index(chunk_pages(iter_document_pages(path, digest)))
+    with _indexes_lock:
+        _indexes[digest] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def retrieve(query: str, path: str, top_k: int = RETRIEVAL_TOP_K, token_budget: int = RETRIEVAL_TOKEN_BUDGET,
+             sections=None) -> list:
+    """Top-k chunks relevant to query that together fit in token_budget, in document order"""
+    selected = []
+    used = 0
+    for chunk, _ in get_index(path).search(query, top_k, sections):
+        cost = estimate_tokens(chunk.text)
+        if used + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used += cost
+    return sorted(selected, key=lambda chunk: chunk.page)
@@ -0,0 +1,77 @@
+## Error classification and backoff for analysis job retries
+import os
+import random
+from dotenv import load_dotenv
+load_dotenv()
+
+from PyPDF2.errors import PdfReadError
+
+from uploads import UploadTooLarge
+
+ANALYSIS_MAX_RETRIES = int(os.getenv('ANALYSIS_MAX_RETRIES', '3'))
+RETRY_BACKOFF_BASE = float(os.getenv('RETRY_BACKOFF_BASE', '2'))
+RETRY_BACKOFF_MAX = float(os.getenv('RETRY_BACKOFF_MAX', '300'))
+
+# Failures that will repeat on every attempt with the same input
+PERMANENT_EXCEPTIONS = (FileNotFoundError, IsADirectoryError, PdfReadError, UploadTooLarge)
+
+# HTTP statuses from the LLM or search provider that are worth retrying
+TRANSIENT_STATUS_CODES = {408, 409, 429}
+
+
+def _causes(exc: BaseException):
+    """exc and the exceptions it was raised from (crewai and litellm wrap provider errors)"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _status_code(exc: BaseException):
+    status = getattr(exc, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_permanent(exc: BaseException) -> bool:
+    """True when retrying cannot help: unreadable documents, and 4xx responses other than 408/409/429
+
+    Anything unrecognised is treated as transient and left to the retry limit.
+    """
+    for cause in _causes(exc):
+        if isinstance(cause, PERMANENT_EXCEPTIONS):
+            return True
+        status = _status_code(cause)
+        if status is not None:
+            return 400 <= status < 500 and status not in TRANSIENT_STATUS_CODES
+    return False
+
+
+def retry_after(exc: BaseException):
+    """Seconds the provider asked us to wait (Retry-After header), if it said"""
+    for cause in _causes(exc):
+        headers = getattr(getattr(cause, 'response', None), 'headers', None) or {}
+        value = headers.get('retry-after')
+        if value is not None:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def backoff_delay(exc: BaseException, retries: int, base: float = RETRY_BACKOFF_BASE,
+                  cap: float = RETRY_BACKOFF_MAX) -> float:
+    """Exponential backoff with full jitter, never shorter than a provider's Retry-After
+
+    Full jitter (a uniform draw up to base * 2**retries) spreads out workers
+    that failed together, e.g. on the same rate limit, so they do not all
+    come back at the same moment.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** retries))
+    requested = retry_after(exc)
+    if requested is not None:
+        delay = max(delay, min(requested, cap))
+    return delay
@@ -0,0 +1,170 @@
+## Cache of web search responses with single-flight request coalescing
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+from result_cache import MemoryBackend, normalize_query
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_PATH = os.getenv('SEARCH_CACHE_PATH', 'data/search_cache.sqlite')
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', str(6 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '2048'))
+
+
+def search_key(query: str, **params) -> str:
+    """Key for a search: the normalized query plus any parameters that change the results"""
+    parts = [normalize_query(query)] + [f"{name}={params[name]}" for name in sorted(params) if params[name] is not None]
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+
+class DiskStore:
+    """SQLite file of JSON responses with expiry, shared by every process on the host"""
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection opened on first use, and reopened in a forked child (SQLite handles must not cross fork)"""
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._pid = os.getpid()
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, query TEXT, response TEXT, expires_at REAL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT response FROM search_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, query: str, response, ttl: int):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, query, response, expires_at) VALUES (?, ?, ?, ?)",
+                (key, query, json.dumps(response, default=str), time.time() + ttl)
+            )
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            self.conn.commit()
+        return deleted
+
+
+class _Flight:
+    """One in-progress upstream call that concurrent identical searches wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class SearchCache:
+    """Memory and disk cache in front of a search API
+
+    Lookups go memory, then disk. On a miss only the first caller for a key
+    performs the upstream request; concurrent callers asking the same thing
+    wait for it and share its response (or its error). Failed searches are
+    not cached.
+    """
+
+    def __init__(self, store: DiskStore = None, ttl: int = SEARCH_CACHE_TTL,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.store = store
+        self.ttl = ttl
+        self.memory = MemoryBackend(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def _lookup(self, key: str):
+        response = self.memory.get(key)
+        if response is None and self.store is not None:
+            response = self.store.get(key)
+            if response is not None:
+                self.memory.set(key, response, self.ttl)
+        return response
+
+    def get_or_fetch(self, key: str, query: str, fetch):
+        """Cached response for key, else fetch() run once for all concurrent callers"""
+        response = self._lookup(key)
+        if response is not None:
+            with self._lock:
+                self.hits += 1
+            return response
+
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                # A leader may have stored the response and left since the lookup above
+                response = self._lookup(key)
+                if response is not None:
+                    self.hits += 1
+                    return response
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = fetch()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            self.memory.set(key, flight.response, self.ttl)
+            if self.store is not None:
+                try:
+                    self.store.set(key, query, flight.response, self.ttl)
+                except sqlite3.Error as e:
+                    logger.warning("Could not persist search response: %s", e)
+            return flight.response
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+
+search_cache = SearchCache(DiskStore())
@@ -1,7 +1,7 @@
 ## Importing libraries and files
 from crewai import Task
-from agents import financial_analyst
-from tools import search_tool, FinancialDocumentTool
+from agents import financial_analyst, verifier, investment_advisor, risk_assessor
+from tools import search_tool, read_pages_tool, retrieve_context_tool
 
 ## Creating a task to analyze financial documents
 analyze_financial_document = Task(
@@ -14,7 +14,10 @@ analyze_financial_document = Task(
     4. Identify any notable trends, risks, or opportunities
     5. Ensure all recommendations are based on factual data from the document
     
-    Use the document reading tool to access the file and search tool for additional market context if needed.""",
+    Use the document retrieval tool to pull only the passages relevant to each point (it labels passages by section
+    and page), the page reader for specific pages, and the search tool for additional market context if needed.
+
+    Document path: {file_path}""",
     
     expected_output="""A comprehensive financial analysis report including:
     - Executive summary addressing the user's query
@@ -27,7 +30,7 @@ analyze_financial_document = Task(
     Format the output as a structured report with clear sections and bullet points where appropriate.""",
     
     agent=financial_analyst,
-    tools=[FinancialDocumentTool().read_data_tool, search_tool],
+    tools=[retrieve_context_tool, read_pages_tool, search_tool],
     async_execution=False,
 )
 
@@ -42,7 +45,11 @@ investment_analysis = Task(
     4. Market position and competitive advantages
     5. Future growth prospects and risks
     
-    User query: {query}""",
+    User query: {query}
+    Document path: {file_path}
+
+    Figures already computed from the document (use them rather than recomputing):
+    {document_metrics}""",
     
     expected_output="""Investment analysis report containing:
     - Investment thesis and rationale
@@ -52,9 +59,10 @@ investment_analysis = Task(
     - Recommended investment strategy
     - Timeline and monitoring metrics""",
     
-    agent=financial_analyst,
-    tools=[FinancialDocumentTool().read_data_tool, search_tool],
-    async_execution=False,
+    agent=investment_advisor,
+    tools=[retrieve_context_tool, read_pages_tool, search_tool],
+    # Runs alongside verification and risk assessment in the pipeline crew
+    async_execution=True,
 )
 
 ## Creating a risk assessment task  
@@ -68,7 +76,11 @@ risk_assessment = Task(
     4. Regulatory and compliance risks
     5. Industry and competitive risks
     
-    Address user query: {query}""",
+    Address user query: {query}
+    Document path: {file_path}
+
+    Figures already computed from the document (use them rather than recomputing):
+    {document_metrics}""",
     
     expected_output="""Risk assessment report including:
     - Risk identification and categorization
@@ -78,9 +90,9 @@ risk_assessment = Task(
     - Overall risk rating and justification
     - Scenario analysis for different risk levels""",
     
-    agent=financial_analyst,
-    tools=[FinancialDocumentTool().read_data_tool, search_tool],
-    async_execution=False,
+    agent=risk_assessor,
+    tools=[retrieve_context_tool, read_pages_tool, search_tool],
+    async_execution=True,
 )
 
 verification_task = Task(
@@ -101,7 +113,63 @@ verification_task = Task(
     - Completeness score and missing elements
     - Recommendations for analysis approach""",
     
+    agent=verifier,
+    tools=[retrieve_context_tool, read_pages_tool],
+    async_execution=True
+)
+
+## Creating a synthesis task that merges the parallel branches
+synthesis_task = Task(
+    description="""Combine the document verification, investment analysis and risk assessment into one report
+    that answers the user's query: {query}
+    
+    Your report should:
+    1. Reconcile the three analyses and resolve any contradictions between them
+    2. Note any data-quality caveats raised during verification
+    3. Balance the investment case against the identified risks
+    4. Keep every figure consistent with the document
+    
+    Only consult the document again (path: {file_path}) to settle a specific disagreement.""",
+    
+    expected_output="""A comprehensive financial analysis report including:
+    - Executive summary addressing the user's query
+    - Key financial metrics and ratios identified
+    - Investment insights and recommendations
+    - Risk factors and considerations
+    - Data-quality caveats from verification
+    - Professional conclusions with actionable recommendations
+    
+    Format the output as a structured report with clear sections and bullet points where appropriate.""",
+    
+    agent=financial_analyst,
+    context=[verification_task, investment_analysis, risk_assessment],
+    tools=[retrieve_context_tool],
+    async_execution=False,
+)
+## Creating a per-section task used by incremental re-analysis
+section_analysis = Task(
+    description="""Analyze the {section} section of a financial filing and address the user's query: {query}
+    
+    Your analysis should:
+    1. Extract the key figures and statements in this section
+    2. Relate them to the user's query
+    3. Identify notable trends, risks or opportunities the section reveals
+    4. Stay within this section; other sections are analyzed separately
+    
+    The section text is provided below, so the document tools are not needed. Use web search only for market
+    context the section itself cannot give.
+
+    Section text:
+    {section_text}""",
+    
+    expected_output="""A focused analysis of this section only:
+    - Key figures and facts from the section
+    - How they bear on the user's query
+    - Trends, risks and opportunities the section reveals
+    
+    Write it as a few short paragraphs or bullet points without a top-level heading.""",
+    
     agent=financial_analyst,
-    tools=[FinancialDocumentTool().read_data_tool],
-    async_execution=False
-)
\ No newline at end of file
+    tools=[search_tool],
+    async_execution=False,
+)
@@ -0,0 +1,46 @@
+"""Shared test setup: in-memory Celery broker, result backend and Redis, SQLite databases
+
+Application modules read their configuration at import time, so the
+environment is set here before any test module imports them. The
+``main``/``agents``/``task``/``tools`` names resolve to the ``*_fixed.py``
+files through the same finder the benchmarks use.
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+_tmp_dir = tempfile.mkdtemp(prefix='analyzer_tests_')
+os.environ.update({
+    'APP_ENV': 'production',
+    'CELERY_BROKER_URL': 'memory://',
+    'CELERY_RESULT_BACKEND': 'cache+memory://',
+    'CELERY_TASK_ALWAYS_EAGER': 'true',
+    'CELERY_WARMUP': 'false',
+    'REDIS_URL': 'memory://',
+    'DATABASE_URL': f"sqlite:///{os.path.join(_tmp_dir, 'app.db')}",
+    'DOCUMENT_CACHE_DIR': os.path.join(_tmp_dir, 'cache'),
+    'SEARCH_CACHE_PATH': os.path.join(_tmp_dir, 'search_cache.sqlite'),
+    'USAGE_LOGGING': 'false',
+    'METRICS_ENABLED': 'false',
+})
+
+import app_modules
+app_modules.install()
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory bound to a fresh SQLite file with every table created"""
+    from database import Base, create_db_engine
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
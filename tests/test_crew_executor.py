@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import pytest
+
+from crew_executor import CrewExecutor, ExecutorSaturated
+
+
+def test_rejects_calls_beyond_running_and_queued_slots():
+    executor = CrewExecutor(max_concurrency=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: "rejected")
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    assert executor.stats()['running'] == 0 and executor.stats()['queued'] == 0
+    executor.shutdown()
+
+
+def test_cancelled_queued_call_frees_its_slot():
+    executor = CrewExecutor(max_concurrency=1, max_queue=1)
+    release = threading.Event()
+    calls = []
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(calls.append, "queued"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        assert executor.stats()['queued'] == 0
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    assert calls == []
+    assert executor.stats()['running'] == 0
+    executor.shutdown()
@@ -0,0 +1,43 @@
+import multiprocessing
+
+from document_cache import DocumentCache
+
+DIGEST = "a" * 64
+
+
+def _hammer(cache_dir: str, rounds: int) -> list:
+    """Hit and re-commit one entry from a separate process, returning any errors"""
+    cache = DocumentCache(cache_dir)
+    errors = []
+    for _ in range(rounds):
+        try:
+            pages = cache.iter_pages(DIGEST)
+            assert pages is not None and len(list(pages)) == 2
+            cache.commit(DIGEST)
+        except Exception as e:
+            errors.append(repr(e))
+    return errors
+
+
+def test_processes_share_a_cache_directory(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    with DocumentCache(cache_dir).page_writer(DIGEST) as write:
+        write({"number": 1, "text": "Total revenues 100"})
+        write({"number": 2, "text": "Net income 7"})
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        results = pool.starmap(_hammer, [(cache_dir, 500)] * 4)
+
+    assert [errors for errors in results if errors] == []
+    assert sorted(path.name for path in (tmp_path / "cache").iterdir()) == [DIGEST, "manifest.json"]
+
+
+def test_hits_do_not_rewrite_the_manifest(tmp_path):
+    cache = DocumentCache(str(tmp_path))
+    with cache.page_writer(DIGEST) as write:
+        write({"number": 1, "text": "Total revenues 100"})
+    (tmp_path / "manifest.json").unlink()
+
+    assert list(cache.iter_pages(DIGEST)) == [{"number": 1, "text": "Total revenues 100"}]
+    assert not (tmp_path / "manifest.json").exists()
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,61 @@
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+
+from extraction import extract_pages_incremental, page_fingerprint
+
+
+def _stream(writer, data: bytes, **entries):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    stream.update({NameObject(key): value for key, value in entries.items()})
+    return writer._add_object(stream)
+
+
+def _form_page(writer, font, text: str):
+    """Page whose content stream only draws form /Fm0, which holds the text"""
+    form = _stream(
+        writer, f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode("ascii"),
+        **{
+            "/Type": NameObject("/XObject"),
+            "/Subtype": NameObject("/Form"),
+            "/BBox": ArrayObject([FloatObject(0), FloatObject(0), FloatObject(612), FloatObject(792)]),
+            "/Resources": DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}),
+        },
+    )
+    writer.add_blank_page(612, 792)
+    page = writer.pages[-1]
+    page[NameObject("/Contents")] = _stream(writer, b"/Fm0 Do")
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Fm0"): form}),
+    })
+
+
+def _form_pdf(path, texts):
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for text in texts:
+        _form_page(writer, font, text)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def test_form_xobject_pages_get_distinct_fingerprints(tmp_path):
+    path = _form_pdf(tmp_path / "forms.pdf", ["Total revenues 100", "Net income 7", "Total revenues 100"])
+    first, second, third = (page_fingerprint(page) for page in PdfReader(str(path)).pages)
+
+    assert first != second
+    assert first == third
+
+
+def test_form_xobject_pages_are_not_reused_for_each_other(tmp_path):
+    path = _form_pdf(tmp_path / "forms.pdf", ["Total revenues 100", "Net income 7"])
+    report = {}
+    pages = extract_pages_incremental(str(path), lambda fingerprints: {}, report)
+
+    assert ["revenues" in pages[0].text, "income" in pages[1].text] == [True, True]
+    assert report == {"reused": 0, "extracted": 2}
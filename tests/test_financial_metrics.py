@@ -0,0 +1,43 @@
+import pytest
+
+from financial_metrics import compute_panel_ratios, compute_ratios, extract_statements, to_panel
+
+
+@pytest.mark.parametrize("header", [
+    "December 31, 2024 December 31, 2023",
+    "Years ended December 31, 2024 and 2023 2024 2023",
+])
+def test_header_with_dates_starts_a_table(header):
+    frame = extract_statements(f"{header}\nTotal current assets 52,000 48,000\n")
+
+    assert frame.loc["current_assets"].to_dict() == {"2023": 48000.0, "2024": 52000.0}
+
+
+def test_header_with_three_years():
+    frame = extract_statements("Year Ended December 31, 2024 2023 2022\nTotal revenues 300 250 200\n")
+
+    assert frame.loc["revenue"].to_dict() == {"2022": 200.0, "2023": 250.0, "2024": 300.0}
+
+
+def test_sequential_growth_compares_periods_of_the_same_kind():
+    text = (
+        "Q4-2023 FY2023 Q4-2024 FY2024\n"
+        "Total revenues 30 100 33 120\n"
+        "Net income 10 40 11 30\n"
+    )
+    ratios = compute_ratios(extract_statements(text))
+
+    assert ratios.loc["revenue_growth", "Q4-2024"] == pytest.approx(0.10)
+    assert ratios.loc["revenue_growth", "FY2024"] == pytest.approx(0.20)
+    assert ratios.loc["net_income_growth", "FY2024"] == pytest.approx(-0.25)
+
+
+def test_panel_growth_uses_each_documents_own_periods():
+    calendar = extract_statements("2023 2024\nTotal revenues 100 120\nNet income 10 12\n")
+    fiscal = extract_statements("FY2023 FY2024\nTotal revenues 200 220\nNet income 20 30\n")
+    quarterly = extract_statements("Q2-2024 Q4-2024\nTotal revenues 50 55\nNet income 5 6\n")
+    ratios = compute_panel_ratios(to_panel({"calendar": calendar, "fiscal": fiscal, "quarterly": quarterly}))
+
+    assert ratios.loc["calendar", ("revenue_growth", "2024")] == pytest.approx(0.20)
+    assert ratios.loc["fiscal", ("net_income_growth", "FY2024")] == pytest.approx(0.50)
+    assert ratios.loc["quarterly", ("revenue_growth", "Q4-2024")] == pytest.approx(0.10)
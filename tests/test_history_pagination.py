@@ -0,0 +1,58 @@
+"""Keyset pagination of analysis history on SQLite"""
+from datetime import datetime
+
+from database import AnalysisResult, get_user_analysis_history_page, save_analysis_result
+
+
+def add_results(db, count: int, user_id: int = 1, created_at: datetime = None):
+    for i in range(count):
+        if created_at is None:
+            save_analysis_result(db, f"task-{user_id}-{i}", user_id, "filing.pdf", "query", "report", 1.0)
+        else:
+            db.add(AnalysisResult(task_id=f"task-{user_id}-{i}", user_id=user_id, file_name="filing.pdf",
+                                  original_query="query", analysis_text="report", created_at=created_at))
+    db.commit()
+
+
+def walk_pages(db, user_id: int = 1, limit: int = 10) -> list:
+    pages, cursor = [], None
+    while True:
+        rows, cursor = get_user_analysis_history_page(db, user_id, limit, cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+        assert len(pages) <= 10, "pagination is not advancing"
+
+
+def test_pages_through_rows_sharing_one_timestamp(session_factory):
+    db = session_factory()
+    try:
+        add_results(db, 25, created_at=datetime(2026, 10, 17, 15, 0, 9))
+        pages = walk_pages(db)
+        assert [len(page) for page in pages] == [10, 10, 5]
+        assert [row_id for page in pages for row_id in page] == list(range(25, 0, -1))
+    finally:
+        db.close()
+
+
+def test_pages_through_rows_with_default_timestamps(session_factory):
+    db = session_factory()
+    try:
+        # Inserted within the same second, so only the id tells them apart at second precision
+        add_results(db, 25)
+        add_results(db, 3, user_id=2)
+        pages = walk_pages(db)
+        assert [row_id for page in pages for row_id in page] == list(range(25, 0, -1))
+    finally:
+        db.close()
+
+
+def test_history_leaves_report_text_unloaded(session_factory):
+    db = session_factory()
+    try:
+        add_results(db, 3)
+        rows, cursor = get_user_analysis_history_page(db, 1, 5)
+        assert cursor is None
+        assert 'analysis_text' not in rows[0].__dict__
+    finally:
+        db.close()
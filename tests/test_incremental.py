@@ -0,0 +1,47 @@
+from extraction import Page
+from incremental import IncrementalAnalyzer, group_sections, split_sections
+
+
+class RecordingPool:
+    """Section crew stand-in that records what it was asked to analyze"""
+
+    def __init__(self):
+        self.inputs = []
+
+    def kickoff(self, inputs):
+        self.inputs.append(inputs)
+        return f"analysis of {inputs['section']}"
+
+
+def filing(notes_edit: str = ""):
+    pages = [Page(number=1, text="Income statement\nTotal revenues 100", section="income_statement")]
+    for number in range(2, 8):
+        pages.append(Page(number=number, text=f"Note {number} " + "x" * 900, section="notes"))
+    pages[-1] = Page(number=7, text=pages[-1].text + notes_edit, section="notes")
+    return pages
+
+
+def analyzer(session_factory, pages, pool):
+    incremental = IncrementalAnalyzer(pool, session_factory=session_factory, workers=1, max_chars=2000)
+    incremental.load_pages = lambda file_path, document_digest: pages
+    return incremental
+
+
+def test_long_sections_are_split_into_page_runs_within_the_budget():
+    parts = split_sections(group_sections(filing()), max_chars=2000)
+
+    assert list(parts) == ["income_statement", "notes", "notes:2", "notes:3"]
+    assert [[page.number for page in pages] for _, pages in parts.values()] == [[1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_every_page_reaches_the_crew_and_only_edited_runs_rerun(session_factory):
+    pool = RecordingPool()
+
+    report = analyzer(session_factory, filing(), pool).run("Assess the notes", "filing.pdf", "d1")
+    analyzed = "\n".join(inputs["section_text"] for inputs in pool.inputs)
+    assert all(f"Note {number} " in analyzed for number in range(2, 8))
+    assert "## Notes to the Financial Statements (pages 6-7)" in report
+
+    pool.inputs.clear()
+    analyzer(session_factory, filing(" restated"), pool).run("Assess the notes", "filing.pdf", "d2")
+    assert [inputs["section"] for inputs in pool.inputs] == ["Notes to the Financial Statements (pages 6-7)"]
@@ -0,0 +1,99 @@
+"""Job API against the in-memory broker and result backend, with tasks run eagerly"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import celery_worker
+import main
+
+# Kept before the fixture replaces it, for tests that run the real document checks
+run_crew_cached = main.run_crew_cached
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    # Jobs run inline; the crew itself is replaced so no LLM or crewai is needed
+    monkeypatch.setattr(main, 'run_crew_cached', lambda query, **kwargs: f"Report for: {query}")
+    monkeypatch.setattr(main, 'checkpoint_stages', lambda: [])
+    monkeypatch.setattr(main, 'JOB_EVENT_POLL_SECONDS', 0.01)
+    return TestClient(main.app)
+
+
+def submit(client, query="Assess liquidity"):
+    response = client.post(
+        '/jobs',
+        files={'file': ('filing.pdf', b'%PDF-1.4 test filing', 'application/pdf')},
+        data={'query': query},
+    )
+    assert response.status_code == 202
+    return response.json()
+
+
+def parse_events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_submitted_job_completes(client):
+    job = submit(client)
+    assert job['status_url'] == f"/jobs/{job['job_id']}"
+
+    status = client.get(job['status_url']).json()
+    assert status['state'] == 'SUCCESS'
+    assert status['progress'] == 100
+    assert status['result']['analysis'] == "Report for: Assess liquidity"
+
+
+def test_failed_job_reports_error(client, monkeypatch):
+    def missing_file(query, **kwargs):
+        raise FileNotFoundError("upload vanished")
+    monkeypatch.setattr(main, 'run_crew_cached', missing_file)
+
+    status = client.get(submit(client)['status_url']).json()
+    assert status['state'] == 'FAILURE'
+    assert status['error'] == "upload vanished"
+
+
+def test_batch_results_maps_unknown_ids_to_null(client):
+    first, second = submit(client, "first")['job_id'], submit(client, "second")['job_id']
+
+    response = client.get('/results', params={'ids': f"{first},missing,{second}"})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert results['missing'] is None
+    assert results[first]['result']['analysis'] == "Report for: first"
+    assert results[second]['result']['analysis'] == "Report for: second"
+
+
+def test_event_stream_closes_after_final_status(client):
+    job = submit(client)
+
+    response = client.get(job['events_url'])
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ['progress']
+    assert events[-1][1]['state'] == 'SUCCESS'
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/jobs/does-not-exist').status_code == 404
+    assert client.get('/jobs/does-not-exist/events').status_code == 404
+
+
+
+def test_corrupt_upload_fails_without_retry_or_crew(client, monkeypatch):
+    kickoffs, retries = [], []
+    monkeypatch.setattr(main, 'run_crew_cached', run_crew_cached)
+    monkeypatch.setattr(main.crew_pool, 'kickoff', lambda *args, **kwargs: kickoffs.append(args))
+    monkeypatch.setattr(celery_worker, 'backoff_delay', lambda *args: retries.append(args) or 0)
+
+    status = client.get(submit(client)['status_url']).json()
+    assert status['state'] == 'FAILURE'
+    assert status['error'] == "EOF marker not found"
+    assert kickoffs == [] and retries == []
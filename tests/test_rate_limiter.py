@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import (
+    FairScheduler, LLMCallLimiter, LocalTokenBuckets, RateLimitTimeout, TokenBucketLimiter, llm_user_context
+)
+
+
+class GateLimiter:
+    """Buckets that admit nothing until opened, recording who got through"""
+
+    def __init__(self):
+        self.open = threading.Event()
+        self.adjusted = []
+
+    def try_acquire(self, tokens):
+        return 0.0 if self.open.is_set() else 0.01
+
+    def adjust(self, tokens):
+        self.adjusted.append(tokens)
+
+
+def queue_call(scheduler, admitted, user, tier="free", tokens=100):
+    waiting = len(scheduler._queue)
+    thread = threading.Thread(target=lambda: (scheduler.acquire(user, tier, tokens), admitted.append(user)))
+    thread.start()
+    while len(scheduler._queue) == waiting:
+        time.sleep(0.001)
+    return thread
+
+
+def test_local_buckets_ask_callers_to_wait_once_empty():
+    buckets = LocalTokenBuckets(requests_per_minute=2, tokens_per_minute=1000)
+
+    assert buckets.take(1, 100) == 0
+    assert buckets.take(1, 100) == 0
+    assert buckets.take(1, 100) > 0
+
+
+def test_token_limiter_caps_calls_larger_than_the_bucket():
+    limiter = TokenBucketLimiter(client=None, requests_per_minute=10, tokens_per_minute=1000)
+
+    assert limiter.try_acquire(50_000) == 0
+
+
+def test_a_busy_user_does_not_starve_others():
+    limiter = GateLimiter()
+    scheduler = FairScheduler(limiter, max_wait=5)
+    admitted = []
+    threads = [queue_call(scheduler, admitted, "busy") for _ in range(3)]
+    threads.append(queue_call(scheduler, admitted, "quiet"))
+
+    limiter.open.set()
+    for thread in threads:
+        thread.join()
+    assert admitted.index("quiet") < 2
+
+
+def test_timed_out_call_does_not_push_the_user_back_and_idle_users_are_forgotten():
+    limiter = GateLimiter()
+    scheduler = FairScheduler(limiter, max_wait=0.05)
+
+    with pytest.raises(RateLimitTimeout):
+        scheduler.acquire("user", "free", 100)
+    assert scheduler._user_finish.get("user", 0.0) == pytest.approx(0.0)
+
+    limiter.open.set()
+    scheduler.acquire("other", "premium", 100)
+    scheduler.acquire("busy", "free", 100)
+    # The second call starts at virtual time 100, past every other user's finish time
+    scheduler.acquire("busy", "free", 100)
+    assert list(scheduler._user_finish) == ["busy"]
+
+
+def test_calls_are_charged_to_the_pinned_user_else_the_context():
+    scheduler = FairScheduler(GateLimiter(), max_wait=1)
+    scheduler.limiter.open.set()
+    charged = []
+    scheduler.acquire = lambda user, tier, tokens: charged.append((user, tier))
+    limiter = LLMCallLimiter(scheduler)
+
+    with llm_user_context(7, "premium"):
+        limiter.before_call("a", "prompt")
+        limiter.before_call("b", "prompt", ("9", "enterprise"))
+    limiter.before_call("c", "prompt")
+    assert charged == [("7", "premium"), ("9", "enterprise"), ("anonymous", "free")]
+
+    limiter.after_call("a", total_tokens=10)
+    assert len(scheduler.limiter.adjusted) == 1
@@ -0,0 +1,48 @@
+import pytest
+from PyPDF2.errors import PdfReadError
+
+from retry_policy import backoff_delay, is_permanent, retry_after
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"status_code": status_code, "headers": headers or {}})()
+
+
+def wrapped(cause):
+    try:
+        raise RuntimeError("crew failed") from cause
+    except RuntimeError as e:
+        return e
+
+
+@pytest.mark.parametrize("exc, permanent", [
+    (PdfReadError("EOF marker not found"), True),
+    (wrapped(PdfReadError("EOF marker not found")), True),
+    (FileNotFoundError("gone"), True),
+    (ProviderError(400), True),
+    (ProviderError(401), True),
+    (ProviderError(429), False),
+    (ProviderError(503), False),
+    (wrapped(ProviderError(408)), False),
+    (RuntimeError("connection reset"), False),
+])
+def test_is_permanent(exc, permanent):
+    assert is_permanent(exc) is permanent
+
+
+def test_backoff_honours_retry_after_up_to_the_cap():
+    exc = wrapped(ProviderError(429, {"retry-after": "40"}))
+
+    assert retry_after(exc) == 40.0
+    assert 40.0 <= backoff_delay(exc, 0, base=2, cap=300) <= 300
+    assert backoff_delay(exc, 0, base=2, cap=30) == 30
+
+
+def test_backoff_grows_with_attempts_within_the_cap():
+    delays = [backoff_delay(RuntimeError(), 2, base=2, cap=10) for _ in range(200)]
+
+    assert all(0 <= delay <= 8 for delay in delays)
+    assert all(0 <= backoff_delay(RuntimeError(), 10, base=2, cap=10) <= 10 for _ in range(200))
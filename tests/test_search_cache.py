@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from search_cache import DiskStore, SearchCache, search_key
+
+
+def test_key_ignores_case_whitespace_and_unset_parameters():
+    assert search_key("  Tesla  Q2 revenue", n=None) == search_key("tesla q2 revenue")
+    assert search_key("tesla", n=10) != search_key("tesla")
+
+
+def test_concurrent_misses_share_one_fetch(tmp_path):
+    cache = SearchCache(DiskStore(str(tmp_path / "search.sqlite")))
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.05)
+        return {"organic": ["result"]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("k", "q", fetch)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fetches) == 1
+    assert results == [{"organic": ["result"]}] * 8
+    assert cache.stats()['misses'] == 1
+
+
+def test_responses_persist_across_processes_sharing_the_file(tmp_path):
+    path = str(tmp_path / "search.sqlite")
+    SearchCache(DiskStore(path)).get_or_fetch("k", "q", lambda: {"organic": ["stored"]})
+
+    other = SearchCache(DiskStore(path))
+    assert other.get_or_fetch("k", "q", pytest.fail) == {"organic": ["stored"]}
+    assert other.stats()['hits'] == 1
+
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    cache = SearchCache(DiskStore(str(tmp_path / "search.sqlite")))
+
+    def failing():
+        raise RuntimeError("search provider down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_fetch("k", "q", failing)
+    assert cache.get_or_fetch("k", "q", lambda: {"organic": []}) == {"organic": []}
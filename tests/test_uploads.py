@@ -0,0 +1,56 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import FORM_OVERHEAD_BYTES, UploadSizeLimit
+
+LIMIT = 1000
+
+
+def limited_client(received: list) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimit, files={'/upload': 1}, max_bytes=LIMIT)
+
+    @app.post('/upload')
+    async def upload(file: UploadFile = File(...)):
+        received.append(len(await file.read()))
+        return {'size': received[-1]}
+
+    @app.post('/other')
+    async def other(file: UploadFile = File(...)):
+        return {'size': len(await file.read())}
+
+    return TestClient(app)
+
+
+def test_declared_oversized_body_is_refused_before_the_endpoint():
+    received = []
+    response = limited_client(received).post(
+        '/upload', files={'file': ('big.pdf', b'x' * (LIMIT + FORM_OVERHEAD_BYTES + 1), 'application/pdf')}
+    )
+
+    assert response.status_code == 413
+    assert response.json()['detail'].startswith("Uploaded file exceeds")
+    assert received == []
+
+
+def test_undeclared_oversized_body_is_cut_off_while_streaming():
+    received = []
+    head = b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.pdf"\r\n\r\n'
+    chunks = [head] + [b'x' * 65536] * 40 + [b'\r\n--b--\r\n']
+
+    # A generator body has no Content-Length, so it goes out chunked
+    response = limited_client(received).post(
+        '/upload', content=iter(chunks), headers={'content-type': 'multipart/form-data; boundary=b'}
+    )
+
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_uploads_within_the_limit_and_other_paths_pass_through():
+    received = []
+    client = limited_client(received)
+
+    assert client.post('/upload', files={'file': ('small.pdf', b'x' * 500, 'application/pdf')}).json() == {'size': 500}
+    big = b'x' * (LIMIT + FORM_OVERHEAD_BYTES + 1)
+    assert client.post('/other', files={'file': ('big.pdf', big, 'application/pdf')}).status_code == 200
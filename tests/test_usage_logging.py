@@ -0,0 +1,107 @@
+"""Buffered usage logging and the daily_usage roll-up against SQLite"""
+import time
+from datetime import date
+
+from database import APIUsage, DailyUsage, DocumentUpload, record_daily_usage, get_user_usage_stats
+from usage_logger import UsageLogWriter
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def log_request(writer, user_id=1, processing_time=1.0, file_size=100):
+    writer.log_api_usage(user_id=user_id, endpoint="/analyze", processing_time=processing_time,
+                         status_code=200, file_size=file_size)
+
+
+def count_rows(session_factory, model) -> int:
+    db = session_factory()
+    try:
+        return db.query(model).count()
+    finally:
+        db.close()
+
+
+def test_writer_flushes_full_batches_in_background(session_factory):
+    writer = UsageLogWriter(session_factory, flush_interval=60, batch_size=3).start()
+    try:
+        log_request(writer)
+        log_request(writer)
+        time.sleep(0.1)
+        assert writer.written == 0
+
+        log_request(writer)
+        wait_for(lambda: writer.written == 3)
+        assert count_rows(session_factory, APIUsage) == 3
+    finally:
+        writer.close()
+
+
+def test_close_flushes_remaining_rows(session_factory):
+    writer = UsageLogWriter(session_factory, flush_interval=60, batch_size=100).start()
+    log_request(writer)
+    writer.log_document_upload(user_id=1, task_id="t1", filename="a.pdf", file_path="data/a.pdf",
+                               file_size=100, content_type="application/pdf")
+    assert writer.written == 0
+
+    writer.close()
+    assert writer.written == 2
+    assert count_rows(session_factory, APIUsage) == 1
+    assert count_rows(session_factory, DocumentUpload) == 1
+
+
+def test_full_buffer_drops_rows_instead_of_blocking(session_factory):
+    writer = UsageLogWriter(session_factory, flush_interval=60, batch_size=100, max_buffer=2)
+    for _ in range(5):
+        log_request(writer)
+    assert writer.dropped == 3
+    assert writer.flush() == 2
+
+
+def test_record_daily_usage_upserts_per_user_and_day(session_factory):
+    day = date(2026, 10, 1)
+    db = session_factory()
+    try:
+        record_daily_usage(db, [
+            {'user_id': 1, 'day': day, 'processing_time': 1.5, 'file_size': 100},
+            {'user_id': 1, 'day': day, 'processing_time': 0.5, 'file_size': None},
+            {'user_id': None, 'day': day, 'processing_time': None, 'file_size': 10},
+        ])
+        db.commit()
+        record_daily_usage(db, [{'user_id': 1, 'day': day, 'processing_time': 2.0, 'file_size': 50}])
+        db.commit()
+
+        rows = {row.user_id: row for row in db.query(DailyUsage).all()}
+        assert set(rows) == {0, 1}
+        assert rows[1].request_count == 3
+        assert rows[1].total_processing_time == 4.0
+        assert rows[1].total_file_size == 150
+        assert rows[0].request_count == 1
+        assert rows[0].total_processing_time == 0.0
+    finally:
+        db.close()
+
+
+def test_usage_stats_from_requests_and_rollup_agree(session_factory):
+    writer = UsageLogWriter(session_factory, batch_size=100)
+    log_request(writer, processing_time=1.0, file_size=1024 * 1024)
+    log_request(writer, processing_time=3.0, file_size=1024 * 1024)
+    # No recorded time still counts towards the average's denominator
+    log_request(writer, processing_time=None, file_size=None)
+    log_request(writer, user_id=2, processing_time=10.0)
+    assert writer.flush() == 4
+
+    db = session_factory()
+    try:
+        expected = {'total_requests': 3, 'avg_processing_time': 4.0 / 3,
+                    'total_file_size_mb': 2.0, 'period_days': 30}
+        assert get_user_usage_stats(db, 1) == expected
+        assert get_user_usage_stats(db, 1, use_rollup=True) == expected
+        assert get_user_usage_stats(db, 3)['total_requests'] == 0
+        assert get_user_usage_stats(db, 3, use_rollup=True)['avg_processing_time'] == 0
+    finally:
+        db.close()
@@ -1,86 +1,186 @@
 ## Importing libraries and files
 import os
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
+from crewai.tools import tool
 from crewai_tools import SerperDevTool
-from crewai_tools import PDFSearchTool
+
+import metrics
+from search_cache import search_cache, search_key
+from extraction import iter_document_pages, read_document_text
+from normalization import normalize_whitespace
+from retrieval import retrieve, RETRIEVAL_TOP_K
+import pandas as pd
+from financial_metrics import (
+    extract_statements, compute_ratios, summarize_ratios, latest_values, format_ratio
+)
 
 ## Creating search tool
-search_tool = SerperDevTool()
+class CachedSerperDevTool(SerperDevTool):
+    """Serper web search answered from the search cache when possible
+
+    Identical searches (after query normalization) within SEARCH_CACHE_TTL
+    cost one Serper call, including ones issued concurrently by parallel
+    analyses; the upstream round trip is recorded as the 'web_search' stage.
+    """
+
+    def _search_upstream(self, **kwargs):
+        with metrics.stage('web_search'):
+            return super()._run(**kwargs)
+
+    def _run(self, **kwargs):
+        query = kwargs.get('search_query') or kwargs.get('query') or ''
+        key = search_key(
+            query,
+            search_type=getattr(self, 'search_type', None),
+            n_results=getattr(self, 'n_results', None),
+            country=getattr(self, 'country', None),
+            location=getattr(self, 'location', None),
+            locale=getattr(self, 'locale', None),
+        )
+        return search_cache.get_or_fetch(key, query, lambda: self._search_upstream(**kwargs))
+
+search_tool = CachedSerperDevTool()
+
+## Ratios reported by the investment tool
+INVESTMENT_RATIOS = [
+    "gross_margin", "operating_margin", "net_margin", "free_cash_flow_margin",
+    "revenue_growth", "revenue_growth_yoy", "net_income_growth",
+]
+
+## Risk ratios with the condition that triggers a warning
+RISK_THRESHOLDS = {
+    "debt_to_equity": (lambda value: value > 2.0, "High leverage: debt exceeds twice equity"),
+    "liabilities_to_equity": (lambda value: value > 3.0, "High leverage: liabilities exceed three times equity"),
+    "current_ratio": (lambda value: value < 1.0, "Liquidity risk: current liabilities exceed current assets"),
+    "quick_ratio": (lambda value: value < 0.8, "Liquidity risk: thin quick-asset cover"),
+    "interest_coverage": (lambda value: value < 3.0, "Coverage risk: operating income covers interest less than 3x"),
+    "operating_margin": (lambda value: value < 0.05, "Profitability risk: operating margin below 5%"),
+    "free_cash_flow_margin": (lambda value: value < 0.0, "Cash burn: negative free cash flow"),
+    "revenue_growth_yoy": (lambda value: value < -0.1, "Demand risk: revenue down more than 10% year over year"),
+}
 
 ## Creating custom pdf reader tool
 class FinancialDocumentTool:
     @staticmethod
-    def read_data_tool(path='data/sample.pdf'):
-        """Tool to read data from a pdf file from a path
-        
+    def read_pages_tool(path: str = 'data/sample.pdf', start_page: int = 1, end_page: Optional[int] = None):
+        """Tool to read a range of pages from a pdf file, labelled by section
+
         Args:
             path (str, optional): Path of the pdf file. Defaults to 'data/sample.pdf'.
-            
+            start_page (int, optional): First page to return (1-based). Defaults to 1.
+            end_page (int, optional): Last page to return (inclusive). Defaults to the last page.
+
         Returns:
-            str: Full Financial Document content
+            str: Text of the requested pages, each prefixed with its page number and section
         """
         try:
-            # Use PDFSearchTool to read the PDF
-            pdf_tool = PDFSearchTool(pdf=path)
-            
-            # Read the entire document
-            full_content = ""
-            
-            # Try to search for common financial terms to extract content
-            financial_keywords = ["revenue", "income", "financial", "balance", "cash flow", "assets", "liabilities"]
-            
-            for keyword in financial_keywords:
-                try:
-                    result = pdf_tool.run(keyword)
-                    if result and result not in full_content:
-                        full_content += result + "\n"
-                except:
+            chunks = []
+            for page in FinancialDocumentTool.iter_document(path):
+                if page.number < int(start_page):
                     continue
-            
-            # If no content found with keywords, try to read the file directly
-            if not full_content.strip():
-                try:
-                    with open(path, 'rb') as f:
-                        import PyPDF2
-                        pdf_reader = PyPDF2.PdfReader(f)
-                        for page in pdf_reader.pages:
-                            full_content += page.extract_text() + "\n"
-                except:
-                    return f"Unable to read PDF file at {path}"
-            
-            # Clean up the content
-            while "\n\n" in full_content:
-                full_content = full_content.replace("\n\n", "\n")
-            
-            return full_content.strip() if full_content.strip() else f"No readable content found in {path}"
-            
+                if end_page is not None and page.number > int(end_page):
+                    break
+                chunks.append(f"[page {page.number} | {page.section}]\n{page.text}")
+            return "\n".join(chunks) if chunks else f"No readable content found in {path}"
+        except FileNotFoundError:
+            return f"Unable to read PDF file at {path}"
+        except Exception as e:
+            return f"Error reading PDF file: {str(e)}"
+
+    @staticmethod
+    def retrieve_context_tool(query: str, path: str = 'data/sample.pdf', top_k: int = RETRIEVAL_TOP_K):
+        """Tool to fetch only the passages of a pdf file relevant to a question
+
+        Args:
+            query (str): The question or topic, e.g. 'operating cash flow and capex'.
+            path (str, optional): Path of the pdf file. Defaults to 'data/sample.pdf'.
+            top_k (int, optional): Maximum number of passages to return.
+
+        Returns:
+            str: Relevant passages labelled with page number and section (income statement,
+                balance sheet, cash flow, MD&A, risk factors, ...)
+        """
+        try:
+            with metrics.stage('retrieval'):
+                chunks = retrieve(query, path, top_k=int(top_k))
+            if not chunks:
+                return f"No passages in {path} matched the query; try different terms or read_pages_tool"
+            return "\n\n".join(chunk.render() for chunk in chunks)
+        except FileNotFoundError:
+            return f"Unable to read PDF file at {path}"
         except Exception as e:
             return f"Error reading PDF file: {str(e)}"
 
+    @staticmethod
+    def document_brief(path='data/sample.pdf'):
+        """Extract a document once and compute its key figures for every pipeline branch
+
+        Args:
+            path (str, optional): Path of the pdf file. Defaults to 'data/sample.pdf'.
+
+        Returns:
+            str: Investment and risk figures computed from the statement tables
+        """
+        with metrics.stage('document_brief'):
+            text = read_document_text(path)
+            return "\n".join([
+                InvestmentTool.analyze_investment_tool(text),
+                RiskTool.create_risk_assessment_tool(text)
+            ])
+
+    @staticmethod
+    def iter_document(path='data/sample.pdf'):
+        """Lazily yield extracted pages (number, text, section) for incremental consumers"""
+        return iter_document_pages(path)
+
+# Agents only accept crewai tools; the argument annotations become the schema the LLM sees
+read_pages_tool = tool("read_pages_tool")(FinancialDocumentTool.read_pages_tool)
+retrieve_context_tool = tool("retrieve_context_tool")(FinancialDocumentTool.retrieve_context_tool)
+
 ## Creating Investment Analysis Tool
 class InvestmentTool:
     @staticmethod
     def analyze_investment_tool(financial_document_data):
-        """Analyze financial document data for investment insights"""
+        """Analyze financial document data for investment insights
+
+        Parses statement tables in the text and computes margins, growth and
+        cash generation for every reported period.
+
+        Args:
+            financial_document_data (str): Extracted financial document text.
+
+        Returns:
+            str: Key figures and ratios for the latest period, for the analyst to interpret
+        """
         if not financial_document_data or financial_document_data.strip() == "":
             return "No financial data provided for analysis"
         
-        # Clean up the data format - fix the double space removal logic
-        processed_data = financial_document_data
-        
-        # Proper way to remove double spaces
-        while "  " in processed_data:  # Two spaces
-            processed_data = processed_data.replace("  ", " ")
-        
-        # Basic analysis framework
+        # Clean up the data format in a single pass
+        processed_data = normalize_whitespace(financial_document_data)
+
+        statements = extract_statements(processed_data)
+        if statements.empty:
+            return "\n".join([
+                f"Document contains {len(processed_data.split())} words of financial information",
+                "No financial statement tables could be parsed; analyze the text directly"
+            ])
+
+        ratios = compute_ratios(statements)
+        latest_period = statements.columns[-1]
         analysis_points = [
-            "Financial data has been processed and cleaned",
-            f"Document contains {len(processed_data.split())} words of financial information",
-            "Recommend further detailed analysis by financial experts",
-            "Investment decisions should be based on comprehensive due diligence"
+            f"Parsed {len(statements.index)} line items across periods: {', '.join(statements.columns)}",
+            f"Key figures ({latest_period}):"
         ]
+        for name in ("revenue", "gross_profit", "operating_income", "net_income", "free_cash_flow"):
+            if name in statements.index and pd.notna(statements.at[name, latest_period]):
+                analysis_points.append(f"- {name.replace('_', ' ').capitalize()}: {statements.at[name, latest_period]:,.0f}")
+        analysis_points.append("Ratios:")
+        analysis_points.extend(
+            f"- {line}" for line in summarize_ratios(ratios.loc[ratios.index.intersection(INVESTMENT_RATIOS)])
+        )
         
         return "\n".join(analysis_points)
 
@@ -88,16 +188,36 @@ class InvestmentTool:
 class RiskTool:
     @staticmethod
     def create_risk_assessment_tool(financial_document_data):
-        """Create risk assessment based on financial document data"""
-        if not financial_document_data or financial_document_data.strip() == "":
+        """Create risk assessment based on financial document data
+
+        Computes leverage, liquidity and coverage ratios from statement
+        tables and flags the ones past common warning thresholds.
+
+        Args:
+            financial_document_data (str): Extracted financial document text.
+
+        Returns:
+            str: Risk indicators for the latest period with any warnings
+        """
+        processed_data = normalize_whitespace(financial_document_data)
+        if not processed_data:
             return "No financial data provided for risk assessment"
-        
-        risk_factors = [
-            "Market risk assessment required based on document analysis",
-            "Credit risk evaluation recommended",
-            "Operational risk factors should be considered", 
-            "Regulatory compliance risk assessment needed",
-            "Liquidity risk analysis recommended"
+
+        ratios = compute_ratios(extract_statements(processed_data))
+        if ratios.empty:
+            return "No financial statement tables could be parsed; assess market, credit, liquidity and regulatory risk from the text"
+
+        latest = latest_values(ratios)
+        risk_factors = ["Risk indicators:"]
+        risk_factors.extend(
+            f"- {line}" for line in summarize_ratios(ratios.loc[ratios.index.intersection(RISK_THRESHOLDS)])
+        )
+        warnings = [
+            f"- {message} ({format_ratio(name, latest[name])})"
+            for name, (breached, message) in RISK_THRESHOLDS.items()
+            if name in latest.index and pd.notna(latest[name]) and breached(latest[name])
         ]
+        risk_factors.append("Warnings:" if warnings else "No ratio breaches a warning threshold")
+        risk_factors.extend(warnings)
         
-        return "\n".join(risk_factors)
\ No newline at end of file
+        return "\n".join(risk_factors)
@@ -0,0 +1,132 @@
+## Streaming uploads to disk
+import os
+import asyncio
+import hashlib
+from dotenv import load_dotenv
+load_dotenv()
+
+from document_cache import document_cache
+
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(100 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+# Room in a request body for multipart boundaries and the other form fields
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Uploaded file exceeds the {max_bytes // (1024 * 1024)} MB limit")
+        self.max_bytes = max_bytes
+
+
+async def save_upload(upload, file_path: str, max_bytes: int = MAX_UPLOAD_BYTES,
+                      chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Stream an UploadFile to disk chunk by chunk, hashing it on the way
+
+    Only one chunk is held in memory at a time. By the time this runs
+    Starlette has already spooled the request body, so the request itself
+    is capped by UploadSizeLimit; here the limit applies per file, and a
+    partial copy over it is removed.
+
+    Args:
+        upload (UploadFile): Incoming file from the request.
+        file_path (str): Destination path.
+        max_bytes (int, optional): Maximum accepted size in bytes.
+        chunk_size (int, optional): Bytes read per chunk.
+
+    Returns:
+        tuple: (size in bytes, SHA-256 hex digest of the content)
+    """
+    sha = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            sha.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    f.close()
+
+    digest = sha.hexdigest()
+    # Later reads of this file reuse the hash instead of re-reading it
+    document_cache.register_digest(file_path, digest)
+    return size, digest
+
+
+class UploadSizeLimit:
+    """ASGI middleware answering 413 for upload requests larger than the limit
+
+    Starlette reads a whole multipart body into a temporary file before the
+    endpoint runs, so the limit has to be applied to the raw request stream.
+    A declared Content-Length over the limit is refused before any of the
+    body is read; a body that turns out larger (e.g. chunked) is cut off as
+    soon as it crosses the limit.
+
+    Args:
+        app: The ASGI app to wrap.
+        files (dict): Path -> number of files its form accepts; other paths are not limited.
+        max_bytes (int, optional): Maximum size of each file.
+    """
+
+    def __init__(self, app, files: dict, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limits = {path: count * max_bytes + FORM_OVERHEAD_BYTES for path, count in files.items()}
+
+    async def _reject(self, scope, receive, send):
+        from starlette.responses import JSONResponse
+
+        response = JSONResponse({'detail': str(UploadTooLarge(self.max_bytes))}, status_code=413)
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope['path']) if scope['type'] == 'http' else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        declared = dict(scope['headers']).get(b'content-length', b'')
+        if declared.isdigit() and int(declared) > limit:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    exceeded = True
+                    raise UploadTooLarge(self.max_bytes)
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            # Whatever the app makes of the aborted body (FastAPI answers 400), the client gets 413
+            if exceeded:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(scope, receive, send)
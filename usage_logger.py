@@ -0,0 +1,128 @@
+## Buffered writer for API usage and document upload logs
+import os
+import queue
+import atexit
+import logging
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+
+from database import SessionLocal, APIUsage, DocumentUpload, record_daily_usage
+
+logger = logging.getLogger(__name__)
+
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '2.0'))
+USAGE_BATCH_SIZE = int(os.getenv('USAGE_BATCH_SIZE', '500'))
+USAGE_MAX_BUFFER = int(os.getenv('USAGE_MAX_BUFFER', '100000'))
+
+
+class UsageLogWriter:
+    """Batches APIUsage and DocumentUpload rows into periodic bulk inserts
+
+    Request handlers only append to an in-memory queue; a background
+    thread flushes every ``flush_interval`` seconds or as soon as
+    ``batch_size`` rows are waiting, one transaction per flush. close()
+    (also registered with atexit) drains whatever is left.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval: float = USAGE_FLUSH_INTERVAL,
+                 batch_size: int = USAGE_BATCH_SIZE, max_buffer: int = USAGE_MAX_BUFFER):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_buffer)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.dropped = 0
+        self.written = 0
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='usage-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _enqueue(self, model, row: dict):
+        try:
+            self._queue.put_nowait((model, row))
+        except queue.Full:
+            # Never block a request on analytics; count what was lost instead
+            self.dropped += 1
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def log_api_usage(self, user_id: int, endpoint: str, processing_time: float,
+                      status_code: int, file_size: int = None):
+        """Queue an APIUsage row"""
+        self._enqueue(APIUsage, {
+            'user_id': user_id,
+            'endpoint': endpoint,
+            'processing_time': processing_time,
+            'status_code': status_code,
+            'file_size': file_size,
+        })
+
+    def log_document_upload(self, user_id: int, task_id: str, filename: str,
+                            file_path: str, file_size: int, content_type: str):
+        """Queue a DocumentUpload row"""
+        self._enqueue(DocumentUpload, {
+            'user_id': user_id,
+            'task_id': task_id,
+            'original_filename': filename,
+            'file_path': file_path,
+            'file_size': file_size,
+            'content_type': content_type,
+        })
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of rows inserted"""
+        with self._flush_lock:
+            batches = {}
+            while True:
+                try:
+                    model, row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.setdefault(model, []).append(row)
+            if not batches:
+                return 0
+
+            count = sum(len(rows) for rows in batches.values())
+            db = self.session_factory()
+            try:
+                for model, rows in batches.items():
+                    db.bulk_insert_mappings(model, rows)
+                record_daily_usage(db, batches.get(APIUsage, []))
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Failed to write %d usage log rows", count)
+                return 0
+            finally:
+                db.close()
+            self.written += count
+            return count
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stop the background thread and flush the remaining rows"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.flush_interval, 5.0))
+            self._thread = None
+        self.flush()
+
+
+## Shared process-wide writer, started by the application on startup
+usage_log_writer = UsageLogWriter()